@@ -0,0 +1,277 @@
+# Local HTTP scoring and report API (standard library only).
+# Accepts the evaluation JSON written by the dashboard's "Download responses"
+# button and returns scores or PDF/Excel reports without opening the UI.
+#
+#   POST /score        -> JSON domain scores, rankings and lowest questions
+#   POST /report/pdf   -> PDF report
+#   POST /report/xlsx  -> Excel report
+#   GET  /health       -> pool, queue and cache counters
+#
+# Work runs on a bounded pool; requests beyond workers + queue slots are
+# rejected with 503 instead of piling up, and identical payloads are served
+# from a content-hash cache (concurrent duplicates share one build).
+import sys
+import json
+import math
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+from pspa_reports import (
+    get_ranking, list_question_banks, score_evaluation, _as_question_bank, _build_excel_report,
+    _build_pdf_report, _summary_frame,
+)
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE = 32
+DEFAULT_CACHE_ENTRIES = 256
+DEFAULT_TIMEOUT = 60
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# ================== JOBS (run on the worker pool) ==================
+def score_job(data):
+    domain_scores, lowest_questions, _, _ = score_evaluation(data)
+    scores = list(domain_scores.values())
+    overall = round(sum(scores) / len(scores), 1) if scores else 0.0
+    return {
+        "project_name": data.get("project_name", ""),
+        # the bank actually scored against (an empty name means the default)
+        "question_bank": _as_question_bank(data.get("question_bank")).key,
+        "domain_scores": domain_scores,
+        "rankings": {d: get_ranking(s) for d, s in domain_scores.items()},
+        "lowest_questions": lowest_questions,
+        "overall_score": overall,
+        "overall_ranking": get_ranking(overall),
+    }
+
+def pdf_job(data):
+    domain_scores, lowest_questions, questions_data, iap = score_evaluation(data)
+    return _build_pdf_report(data.get("project_name") or "Project", domain_scores, lowest_questions, questions_data, iap=iap)
+
+def xlsx_job(data):
+    domain_scores, _, questions_data, iap = score_evaluation(data)
+    return _build_excel_report(_summary_frame(domain_scores, iap), pd.DataFrame(questions_data),
+                               data.get("project_name") or "Project", datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+# Top-level fields the jobs read: {field: allowed value types}. Mapping fields
+# are checked per value so a malformed upload gets a 400, not a 500 from deep
+# inside the report builders.
+_TEXT = (str, type(None))
+_NUMBER = (int, float)
+_FIELDS = {"project_name": _TEXT, "project_objectives": _TEXT, "question_bank": _TEXT}
+_MAPPINGS = {"scores": _NUMBER, "notes": _TEXT, "improvements": _TEXT, "responsible": _TEXT, "review_date": _TEXT}
+
+def validate_evaluation(data):
+    """Return an error message when `data` does not fit the JSON download schema, else None."""
+    if not isinstance(data, dict):
+        return "evaluation must be a JSON object"
+    for field, types in _FIELDS.items():
+        if not isinstance(data.get(field), types):
+            return f"{field!r} must be a string"
+    bank = data.get("question_bank")
+    if bank and bank not in list_question_banks():
+        return f"unknown question bank {bank!r}"
+    for field, types in _MAPPINGS.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, dict):
+            return f"{field!r} must be an object"
+        for k, v in value.items():
+            if types is _NUMBER:
+                if isinstance(v, bool) or not isinstance(v, _NUMBER) or not math.isfinite(v) or not 0 <= v <= 10:
+                    return f"{field}[{k!r}] must be a number from 0 to 10"
+            elif not isinstance(v, types):
+                return f"{field}[{k!r}] must be a string"
+    return None
+
+def _reject_constant(name):
+    # json.loads accepts NaN/Infinity by default; they are not JSON
+    raise ValueError(f"{name} is not valid JSON")
+
+# path -> (job, content type)
+ROUTES = {
+    "/score": (score_job, "application/json"),
+    "/report/pdf": (pdf_job, "application/pdf"),
+    "/report/xlsx": (xlsx_job, XLSX_MIME),
+}
+
+
+class Overloaded(Exception):
+    """All workers busy and the queue is full."""
+
+
+class ReportService:
+    """Bounded worker pool + content-hash result cache shared by all HTTP threads."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE,
+                 cache_entries=DEFAULT_CACHE_ENTRIES, timeout=DEFAULT_TIMEOUT, processes=False):
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=workers)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.cache_entries = cache_entries
+        # Admission control: at most `workers` running plus `queue_size` waiting
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._cache = OrderedDict()  # key -> Future (in flight or done)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "cache_hits": 0, "rejected": 0, "errors": 0}
+
+    @staticmethod
+    def cache_key(path, data):
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return path + ":" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def submit(self, path, data):
+        """Return the result of ROUTES[path] for `data`, from cache when possible."""
+        job = ROUTES[path][0]
+        key = self.cache_key(path, data)
+        with self._lock:
+            self.stats["requests"] += 1
+            fut = self._cache.get(key)
+            if fut is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+        if fut is None:
+            if not self._slots.acquire(blocking=False):
+                with self._lock:
+                    self.stats["rejected"] += 1
+                raise Overloaded()
+            fut = self.executor.submit(job, data)
+            fut.add_done_callback(lambda _f: self._slots.release())
+            with self._lock:
+                self._cache[key] = fut
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise
+        except Exception:
+            # Do not cache failures
+            with self._lock:
+                if self._cache.get(key) is fut:
+                    del self._cache[key]
+                self.stats["errors"] += 1
+            raise
+
+    def health(self):
+        with self._lock:
+            return dict(self.stats, workers=self.workers, queue_size=self.queue_size,
+                        cached=len(self._cache))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "PSPA-API/1.2"
+    service = None  # set by make_server()
+
+    def log_message(self, fmt, *args):
+        if getattr(self.server, "verbose", False):
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.service.health())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        if route is None:
+            return self._send(404, {"error": "not found"})
+        header = self.headers.get("Content-Length")
+        if header is None:
+            return self._send(411, {"error": "Content-Length required"})
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._send(400, {"error": "invalid Content-Length"})
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"})
+        try:
+            data = json.loads(self.rfile.read(length).decode("utf-8") or "null", parse_constant=_reject_constant)
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._send(400, {"error": f"invalid JSON: {e}"})
+        error = validate_evaluation(data)
+        if error:
+            return self._send(400, {"error": error})
+        try:
+            result = self.service.submit(self.path, data)
+        except Overloaded:
+            return self._send(503, {"error": "server busy, retry later"}, headers={"Retry-After": "1"})
+        except FutureTimeout:
+            return self._send(504, {"error": "report build timed out"})
+        except Exception as e:
+            # Details go to the server log only
+            self.log_error("%s failed: %r", self.path, e)
+            return self._send(500, {"error": "internal error"})
+        self._send(200, result, content_type=route[1])
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog (5) makes bursts of clients wait on TCP SYN retries
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8765, verbose=False, **service_kwargs):
+    """Create (but do not start) the HTTP server; `server.service` is its ReportService."""
+    service = ReportService(**service_kwargs)
+    handler = type("PSPAHandler", (_Handler,), {"service": service})
+    server = _Server((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local PSPA scoring and report API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent report builds")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE, help="requests allowed to wait for a worker")
+    parser.add_argument("--cache", type=int, default=DEFAULT_CACHE_ENTRIES, help="cached results (content hash)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds before a build times out")
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, verbose=args.verbose, workers=args.workers,
+                         queue_size=args.queue, cache_entries=args.cache, timeout=args.timeout,
+                         processes=args.processes)
+    print(f"PSPA API listening on http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} workers, queue {args.queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# Debounced write-behind autosave for dashboard sessions.
+# Each rerun only hands a snapshot of the evaluation fields to the journal
+# (a dict copy, no I/O). A single background writer waits until a session
+# has been quiet for DEBOUNCE_SECONDS, diffs the snapshot against what is
+# already on disk and appends one compact JSON line to that session's
+# append-only journal. Journals are compacted into a single full snapshot
+# every COMPACT_EVERY lines, and replayed on reconnect. Journals idle for
+# JOURNAL_IDLE_SECONDS are dropped from memory (their file stays) and files
+# untouched for AUTOSAVE_MAX_AGE_DAYS are deleted.
+#
+# The session id is the only key to a journal: whoever opens a URL carrying
+# the same ?sid= restores (and keeps writing) that session's answers. Treat
+# the dashboard URL as private, or set PSPA_AUTOSAVE=0 on shared deployments.
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import date
+
+AUTOSAVE_ENABLED = os.environ.get("PSPA_AUTOSAVE", "1") != "0"
+AUTOSAVE_DIR = os.environ.get("PSPA_AUTOSAVE_DIR") or os.path.join(os.path.expanduser("~"), ".pspa_autosave")
+AUTOSAVE_MAX_AGE_DAYS = float(os.environ.get("PSPA_AUTOSAVE_MAX_AGE_DAYS", "30"))
+DEBOUNCE_SECONDS = 1.5
+COMPACT_EVERY = 200
+JOURNAL_IDLE_SECONDS = 15 * 60
+PRUNE_EVERY_SECONDS = 60 * 60
+
+_log = logging.getLogger(__name__)
+
+# Session-state keys worth persisting
+AUTOSAVE_PREFIXES = ("slider_", "note_", "improve-", "resp-", "date-")
+# _bank_answers holds the answers parked for the other banks ({bank: {key: value}})
+AUTOSAVE_KEYS = ("project_name", "project_objectives", "question_bank", "_bank_answers")
+
+
+def snapshot_state(state):
+    """Copy the persistable evaluation fields out of a session-state mapping.
+
+    Values are not copied: the journal diffs against the last snapshot, so
+    callers replace dict values (e.g. _bank_answers) rather than mutate them."""
+    return {k: state[k] for k in list(state.keys())
+            if isinstance(k, str) and (k.startswith(AUTOSAVE_PREFIXES) or k in AUTOSAVE_KEYS)}
+
+def _encode(v):
+    if isinstance(v, date):
+        return {"$date": v.isoformat()}
+    if isinstance(v, dict):
+        return {k: _encode(x) for k, x in v.items()}
+    return v
+
+def _decode(v):
+    if isinstance(v, dict):
+        if "$date" in v:
+            try:
+                return date.fromisoformat(v["$date"])
+            except ValueError:
+                return date.today()
+        return {k: _decode(x) for k, x in v.items()}
+    return v
+
+_MISSING = object()
+
+def diff_state(old, new):
+    """(changed, removed): entries of `new` that differ from `old`, and keys of `old` missing from `new`."""
+    changed = {k: v for k, v in new.items() if old.get(k, _MISSING) != v}
+    removed = [k for k in old if k not in new]
+    return changed, removed
+
+
+class AutosaveJournal:
+    """Append-only journal of one session's evaluation fields.
+
+    Lines are {"full": {...}} (compacted snapshot) or {"set": {...}, "del": [...]}
+    (diff against the previous state); a torn last line is ignored on replay."""
+
+    def __init__(self, path, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # writer thread vs. exit-time flush
+        self._pending = None
+        self._staged_at = 0.0
+        self._on_disk = None  # state as last written (loaded lazily by the writer)
+        self._lines = 0
+        self._torn = False  # journal ends in a partial line (crash mid-write)
+
+    def stage(self, snapshot):
+        # Called from the script thread: constant-time hand-off, never touches disk
+        with self._lock:
+            self._pending = snapshot
+            self._staged_at = time.monotonic()
+
+    def due(self, now, debounce):
+        with self._lock:
+            return self._pending is not None and now - self._staged_at >= debounce
+
+    def idle(self, now, seconds):
+        # Nothing pending and nothing staged for `seconds`: safe to drop from memory
+        with self._lock:
+            return self._pending is None and now - self._staged_at >= seconds
+
+    def load(self):
+        """Replay the journal into a dict (empty if there is none)."""
+        with self._io_lock:
+            return self._load()
+
+    def _load(self):
+        state, lines, torn = {}, 0, False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    lines += 1
+                    if "full" in rec:
+                        state = {k: _decode(v) for k, v in rec["full"].items()}
+                    for k, v in rec.get("set", {}).items():
+                        state[k] = _decode(v)
+                    for k in rec.get("del", []):
+                        state.pop(k, None)
+        except FileNotFoundError:
+            pass
+        self._lines = lines
+        self._torn = torn
+        return state
+
+    def flush(self):
+        """Write the pending snapshot as a diff line (writer thread / exit only)."""
+        with self._io_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+        if snapshot is None:
+            return False
+        if self._on_disk is None:
+            self._on_disk = self._load()
+        changed, removed = diff_state(self._on_disk, snapshot)
+        changed = {k: _encode(v) for k, v in changed.items()}
+        if not changed and not removed:
+            return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        rec = {"t": round(time.time(), 3), "set": changed}
+        if removed:
+            rec["del"] = removed
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(("\n" if self._torn else "") + json.dumps(rec, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._on_disk = dict(snapshot)
+        self._torn = False
+        self._lines += 1
+        if self._lines >= self.compact_every:
+            self._compact()
+        return True
+
+    def compact(self):
+        """Rewrite the journal as a single full snapshot (atomic replace)."""
+        with self._io_lock:
+            self._compact()
+
+    def _compact(self):
+        state = self._on_disk if self._on_disk is not None else self._load()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"t": round(time.time(), 3), "full": {k: _encode(v) for k, v in state.items()}},
+                               separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._lines = 1
+
+
+class _Writer(threading.Thread):
+    """Single daemon thread flushing every session journal once it is quiet."""
+
+    def __init__(self, debounce, directory=None):
+        super().__init__(name="pspa-autosave", daemon=True)
+        self.debounce = debounce
+        self.directory = directory or AUTOSAVE_DIR
+        self.journals = {}
+        self.lock = threading.Lock()
+
+    def run(self):
+        next_prune = 0.0
+        while True:
+            time.sleep(self.debounce / 3)
+            now = time.monotonic()
+            self.flush_due(now)
+            self.evict_idle(now)
+            if now >= next_prune:
+                prune_journals(self.directory)
+                next_prune = now + PRUNE_EVERY_SECONDS
+
+    def flush_due(self, now, force=False):
+        with self.lock:
+            journals = list(self.journals.values())
+        for j in journals:
+            if force or j.due(now, self.debounce):
+                try:
+                    j.flush()
+                except Exception:
+                    # Disk unavailable or an unserializable value: keep this session
+                    # usable and the writer thread alive for every other one
+                    _log.exception("Autosave flush failed for %s", j.path)
+
+    def evict_idle(self, now, idle=JOURNAL_IDLE_SECONDS):
+        """Forget flushed journals that have been quiet for `idle` seconds (the file stays)."""
+        with self.lock:
+            for key in [k for k, j in self.journals.items() if j.idle(now, idle)]:
+                del self.journals[key]
+
+def prune_journals(directory=None, max_age_days=AUTOSAVE_MAX_AGE_DAYS):
+    """Delete journal files not written for `max_age_days`. Returns the number removed."""
+    directory = directory or AUTOSAVE_DIR
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith((".jsonl", ".jsonl.tmp")):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _Writer(DEBOUNCE_SECONDS)
+            _writer.start()
+            atexit.register(lambda: _writer.flush_due(time.monotonic(), force=True))
+        return _writer
+
+def _journal_locked(writer, session_id, directory=None):
+    # Caller holds writer.lock
+    safe = "".join(c for c in str(session_id) if c.isalnum() or c in "-_")[:64] or "default"
+    j = writer.journals.get(safe)
+    if j is None:
+        j = writer.journals[safe] = AutosaveJournal(os.path.join(directory or AUTOSAVE_DIR, f"{safe}.jsonl"))
+    return j
+
+def get_journal(session_id, directory=None):
+    """Journal for `session_id`, shared by every rerun in this process."""
+    writer = _get_writer()
+    with writer.lock:
+        return _journal_locked(writer, session_id, directory)
+
+def autosave(session_id, state):
+    """Stage the current evaluation fields for a debounced background write."""
+    snapshot = snapshot_state(state)
+    writer = _get_writer()
+    # Staged under the writer lock so an idle journal cannot be evicted in between
+    with writer.lock:
+        _journal_locked(writer, session_id).stage(snapshot)
@@ -0,0 +1,250 @@
+# Multi-assessor consensus.
+# N evaluations of the same project (the JSON download schema, one file per
+# assessor) are loaded as a single assessors x questions score matrix laid
+# out like the question bank. Every statistic is computed column-wise with
+# NumPy: consensus (median or mean), dispersion, per-item agreement (rWG),
+# Krippendorff's alpha per domain and overall. The merged panel is an
+# ordinary evaluation dict, so the summary table and the PDF/Excel reports
+# take it unchanged; the agreement figures ride along as extra columns/sheets.
+import sys
+import json
+import argparse
+import warnings
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pspa_reports import (
+    DEFAULT_QUESTION_BANK, _as_question_bank, _as_score, score_evaluation, _summary_frame, _build_excel_report, _build_pdf_report,
+)
+
+SCALE_POINTS = 11          # 0-10 slider
+AGREEMENT_THRESHOLD = 0.7  # items with rWG below this are flagged
+CONSENSUS_METHODS = ("median", "mean")
+
+# Variance of a uniform (no agreement) response over the scale: (A^2 - 1) / 12
+_UNIFORM_VARIANCE = (SCALE_POINTS ** 2 - 1) / 12
+
+
+def krippendorff_alpha(scores):
+    """Krippendorff's alpha (interval metric) of an assessors x items matrix.
+
+    NaN marks a missing score; items scored by fewer than two assessors do
+    not count. Returns NaN when nothing is pairable and 1.0 when every
+    pairable score is identical."""
+    S = np.asarray(scores, dtype=np.float64)
+    valid = ~np.isnan(S)
+    m = valid.sum(axis=0)
+    pairable = m >= 2
+    if not pairable.any():
+        return float("nan")
+    X = np.where(valid, S, 0.0)[:, pairable]
+    m = m[pairable]
+    s1, s2 = X.sum(axis=0), (X * X).sum(axis=0)
+    n = m.sum()
+    # sum over ordered pairs i != j of (a_i - a_j)^2 == 2*m*sum(a^2) - 2*sum(a)^2
+    d_obs = (2 * (m * s2 - s1 * s1) / (m - 1)).sum() / n
+    d_exp = (2 * n * s2.sum() - 2 * s1.sum() ** 2) / (n * (n - 1))
+    return 1.0 if d_exp <= 0 else float(1 - d_obs / d_exp)
+
+
+class AssessorPanel:
+    """Evaluations of one project by several assessors.
+
+    `scores[a, q]` is assessor `a`'s score for `bank.questions[q]` (NaN when
+    the item was left unscored); notes and IAP fields are merged as the
+    evaluations stream in, so the source dicts are not kept."""
+
+    def __init__(self, bank, scores, assessors, project_name="", project_objectives="", notes=None, iap=None):
+        self.bank = bank
+        self.scores = scores
+        self.assessors = assessors
+        self.project_name = project_name
+        self.project_objectives = project_objectives
+        self.notes = notes or {}
+        self.iap = iap or {}
+        self._stats = None
+
+    def __len__(self):
+        return len(self.assessors)
+
+    def item_stats(self):
+        """One row per question: assessor count, consensus, dispersion and agreement."""
+        if self._stats is not None:
+            return self._stats
+        S = self.scores
+        n = (~np.isnan(S)).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN / single-assessor columns
+            mean = np.nanmean(S, axis=0)
+            median = np.nanmedian(S, axis=0)
+            var = np.nanvar(S, axis=0, ddof=1)
+            q1, q3 = np.nanpercentile(S, [25, 75], axis=0)
+            lo, hi = np.nanmin(S, axis=0), np.nanmax(S, axis=0)
+        var = np.where(n >= 2, var, np.nan)
+        rwg = np.clip(1 - var / _UNIFORM_VARIANCE, 0.0, 1.0)
+        qids, domains, texts = zip(*self.bank.questions) if len(self.bank) else ((), (), ())
+        self._stats = pd.DataFrame({
+            "Domain": domains,
+            "Question Number": qids,
+            "Question": texts,
+            "Assessors": n,
+            "Mean": mean.round(2),
+            "Median": median,
+            "SD": np.sqrt(var).round(2),
+            "IQR": (q3 - q1),
+            "Min": lo,
+            "Max": hi,
+            "rWG": rwg.round(2),
+            "Flag": rwg < AGREEMENT_THRESHOLD,
+        })
+        return self._stats
+
+    def flagged(self, top=None):
+        """Items with rWG below AGREEMENT_THRESHOLD, most disagreed first."""
+        stats = self.item_stats()
+        out = stats[stats["Flag"]].sort_values(["SD", "Question Number"], ascending=[False, True], kind="stable")
+        return out.head(top) if top else out
+
+    def domain_agreement(self):
+        """{domain: {"Assessors", "SD", "Alpha"}} where SD is the spread of the
+        assessors' domain averages and Alpha is Krippendorff's alpha of the domain items."""
+        S = self.scores
+        valid = ~np.isnan(S)
+        starts = [start for start, _ in self.bank.domain_slices.values()]
+        # Per-assessor domain averages in one pass over the contiguous domain ranges
+        sums = np.add.reduceat(np.where(valid, S, 0.0), starts, axis=1)
+        counts = np.add.reduceat(valid, starts, axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            dom_means = sums / counts
+            dom_sd = np.nanstd(dom_means, axis=0, ddof=1) if len(S) > 1 else np.full(len(starts), np.nan)
+        out = {}
+        for i, (domain, (start, stop)) in enumerate(self.bank.domain_slices.items()):
+            out[domain] = {"Assessors": int((counts[:, i] > 0).sum()),
+                           "SD": round(float(dom_sd[i]), 2),
+                           "Alpha": round(krippendorff_alpha(S[:, start:stop]), 2)}
+        return out
+
+    def alpha(self):
+        return krippendorff_alpha(self.scores)
+
+    def consensus_evaluation(self, method="median"):
+        """The panel merged into one evaluation dict (JSON download schema).
+
+        Scores are the per-question consensus; items nobody scored are left
+        out (the reports then use the usual default). Notes and IAP texts are
+        concatenated with the assessor name."""
+        if method not in CONSENSUS_METHODS:
+            raise ValueError(f"Unknown consensus method {method!r}; expected one of {CONSENSUS_METHODS}")
+        values = self.item_stats()["Median" if method == "median" else "Mean"].to_numpy()
+        scores = {f"slider_{qid}": round(float(v), 1)
+                  for (qid, _, _), v in zip(self.bank.questions, values) if not np.isnan(v)}
+        iap = {d: self.iap.get(d, {}) for d in self.bank.domains}
+        return {
+            "project_name": self.project_name,
+            "project_objectives": self.project_objectives,
+            "evaluation_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "question_bank": self.bank.key,
+            "assessors": list(self.assessors),
+            "consensus": method,
+            "scores": scores,
+            "notes": {f"note_{qid}": "\n".join(v) for qid, v in self.notes.items()},
+            "improvements": {d: "\n".join(p.get("action", [])) for d, p in iap.items()},
+            "responsible": {d: "; ".join(p.get("responsible", [])) for d, p in iap.items()},
+            # earliest review date proposed by any assessor
+            "review_date": {d: min(p.get("review_date", [""])) for d, p in iap.items()},
+        }
+
+
+def load_panel(evaluations, domains=None):
+    """Build an AssessorPanel from an iterable of evaluation dicts.
+
+    `domains` is as for score_evaluation(); by default the bank recorded in
+    the first evaluation is used for the whole panel. Evaluations are
+    consumed one at a time; each contributes one row to the score matrix.
+    An optional "assessor" field names the row (else "Assessor <n>").
+
+    Raises ValueError when an evaluation was made with a different question
+    bank or names a different project than the first one: question ids repeat
+    across banks, so such a file would be merged without any error."""
+    bank = first_bank = None
+    rows, assessors, notes, iap = [], [], {}, {}
+    project_name = project_objectives = ""
+    for i, data in enumerate(evaluations, start=1):
+        name = str(data.get("assessor") or f"Assessor {i}")
+        recorded = data.get("question_bank") or DEFAULT_QUESTION_BANK
+        if bank is None:
+            bank = _as_question_bank(domains if domains is not None else data.get("question_bank"))
+            first_bank = recorded
+        elif recorded != first_bank:
+            raise ValueError(f"{name} used question bank {recorded!r}, not {first_bank!r} like the first evaluation")
+        project = (data.get("project_name") or "").strip()
+        if project and project_name and project != project_name.strip():
+            raise ValueError(f"{name} evaluated project {project!r}, not {project_name.strip()!r}")
+        assessors.append(name)
+        project_name = project_name or data.get("project_name") or ""
+        project_objectives = project_objectives or data.get("project_objectives") or ""
+        row = np.full(len(bank), np.nan)
+        for k, v in (data.get("scores") or {}).items():
+            j = bank.index.get(k[len("slider_"):]) if k.startswith("slider_") else None
+            if j is not None:
+                row[j] = _as_score(v, default=np.nan)
+        rows.append(row)
+        for k, v in (data.get("notes") or {}).items():
+            qid = k[len("note_"):]
+            if v and qid in bank.index:
+                notes.setdefault(qid, []).append(f"[{name}] {v}")
+        for field, key in (("improvements", "action"), ("responsible", "responsible"), ("review_date", "review_date")):
+            for d, v in (data.get(field) or {}).items():
+                if v and d in bank.domains:
+                    vals = iap.setdefault(d, {}).setdefault(key, [])
+                    v = f"[{name}] {v}" if key == "action" else str(v)
+                    if v not in vals:
+                        vals.append(v)
+    if bank is None:
+        raise ValueError("No evaluations to merge")
+    scores = np.vstack(rows)
+    return AssessorPanel(bank, scores, assessors, project_name, project_objectives, notes, iap)
+
+
+def panel_reports(panel, method="median", top=10, eval_date_str=None):
+    """(consensus evaluation, summary frame, PDF bytes, Excel bytes) for a panel."""
+    data = panel.consensus_evaluation(method)
+    domain_scores, lowest_questions, questions_data, iap = score_evaluation(data, panel.bank)
+    df_summary = _summary_frame(domain_scores, iap, agreement=panel.domain_agreement())
+    name = panel.project_name or "Project"
+    label = f"{name} ({len(panel)} assessors, {method})"
+    pdf_bytes = _build_pdf_report(label, domain_scores, lowest_questions, questions_data, iap=iap,
+                                  disagreements=panel.flagged(top))
+    excel_bytes = _build_excel_report(df_summary, pd.DataFrame(questions_data), label,
+                                      eval_date_str or datetime.now().strftime("%Y-%m-%d %H:%M"),
+                                      df_agreement=panel.item_stats())
+    return data, df_summary, pdf_bytes, excel_bytes
+
+
+def main(argv=None):
+    from pspa_portfolio import iter_evaluation_files
+    parser = argparse.ArgumentParser(description="Merge several assessors' evaluations of one project.")
+    parser.add_argument("inputs", nargs="+", help="evaluation .json files or directories containing them")
+    parser.add_argument("--method", choices=CONSENSUS_METHODS, default="median", help="per-question consensus")
+    parser.add_argument("--top", type=int, default=10, help="most-disagreed items to list")
+    parser.add_argument("--json", help="write the consensus evaluation (JSON download schema)")
+    parser.add_argument("--pdf", help="write the consensus PDF report")
+    parser.add_argument("--xlsx", help="write the consensus Excel report")
+    args = parser.parse_args(argv)
+    panel = load_panel(iter_evaluation_files(args.inputs))
+    data, df_summary, pdf_bytes, excel_bytes = panel_reports(panel, args.method, args.top)
+    print(f"{len(panel)} assessors, {len(panel.bank)} questions, Krippendorff's alpha {panel.alpha():.2f}")
+    print(df_summary.drop(columns=["Improvement Action Plan", "IAP Responsible", "IAP Review Date"]).to_string(index=False))
+    flagged = panel.flagged(args.top)
+    if len(flagged):
+        print(f"\nMost disagreed items (rWG < {AGREEMENT_THRESHOLD}):")
+        print(flagged[["Question Number", "Median", "SD", "Min", "Max", "rWG"]].to_string(index=False))
+    for path, payload in ((args.json, json.dumps(data, indent=2).encode("utf-8")), (args.pdf, pdf_bytes), (args.xlsx, excel_bytes)):
+        if path:
+            with open(path, "wb") as fh:
+                fh.write(payload)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# Golden-output and performance harness for the PDF and Excel reports.
+# Every fixture in golden/fixtures (one evaluation in the JSON download
+# schema, or a list of them = multi-assessor panel) is rendered with the
+# report builders; the semantic content of the output -- PDF page count and
+# text per page, workbook cells per sheet and chart series ranges -- is
+# compared with golden/snapshots/<fixture>.json, and build time and peak
+# Python memory are recorded per fixture.
+#
+#   python pspa_golden.py                   # check every fixture
+#   python pspa_golden.py --update          # accept the current output
+#   python pspa_golden.py long_notes -r 10  # one fixture, 10 timed builds
+#   python pspa_golden.py --notes-scaling   # build time vs. total notes (64 KB .. 1 MB)
+#
+# PDF text is extracted with pypdf; workbooks are read straight from their
+# XML parts.
+import os
+import re
+import sys
+import json
+import time
+import random
+import difflib
+import zipfile
+import argparse
+import tracemalloc
+import xml.etree.ElementTree as ET
+from io import BytesIO
+import pandas as pd
+from pspa_reports import load_question_bank, score_evaluation, _summary_frame, _build_excel_report, _build_pdf_report
+from pspa_consensus import load_panel, panel_reports
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+FIXTURE_DIR = os.path.join(GOLDEN_DIR, "fixtures")
+SNAPSHOT_DIR = os.path.join(GOLDEN_DIR, "snapshots")
+EVAL_DATE = "2025-01-01 00:00"  # fixed Excel header date
+MAX_DIFF_LINES = 20
+
+# The PDF header carries the build time
+_PDF_VOLATILE = [(re.compile(r"Date: \d{4}-\d{2}-\d{2} \d{2}:\d{2}"), "Date: <build time>")]
+
+_NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "c": "http://schemas.openxmlformats.org/drawingml/2006/chart",
+}
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+# ================== BUILD ==================
+def build_reports(fixture):
+    """(PDF bytes, Excel bytes) for one fixture, built like the dashboard / API."""
+    if isinstance(fixture, list):
+        _, _, pdf_bytes, excel_bytes = panel_reports(load_panel(fixture), eval_date_str=EVAL_DATE)
+        return pdf_bytes, excel_bytes
+    name = fixture.get("project_name") or "Project"
+    domain_scores, lowest_questions, questions_data, iap = score_evaluation(fixture)
+    pdf_bytes = _build_pdf_report(name, domain_scores, lowest_questions, questions_data, iap=iap)
+    excel_bytes = _build_excel_report(_summary_frame(domain_scores, iap), pd.DataFrame(questions_data), name, EVAL_DATE)
+    return pdf_bytes, excel_bytes
+
+
+# ================== LONG-NOTES SCALING ==================
+# Generated rather than stored: a 1 MB fixture and its snapshot would dwarf the repo
+NOTES_SCALING_KB = (64, 256, 1024)
+_NOTE_WORDS = "audit incident medication reporting staff ward review protocol compliance observed handover".split()
+
+def long_notes_evaluation(total_kb, seed=0):
+    """Default-bank evaluation whose notes (every 4th question) add up to about `total_kb` KB."""
+    bank = load_question_bank()
+    rnd = random.Random(seed)
+    targets = bank.questions[::4]
+    per_note = total_kb * 1024 // len(targets)
+    notes = {}
+    for qid, _, _ in targets:
+        words, size = [], 0
+        while size < per_note:
+            w = rnd.choice(_NOTE_WORDS)
+            words.append(w + ("\n" if rnd.random() < 0.02 else " "))
+            size += len(w) + 1
+        notes[f"note_{qid}"] = "".join(words).strip()
+    return {
+        "project_name": f"Long notes {total_kb} KB",
+        "question_bank": bank.key,
+        "scores": {f"slider_{qid}": rnd.randint(0, 10) for qid, _, _ in bank.questions},
+        "notes": notes,
+        "improvements": {d: "Weekly huddles and audit feedback" for d in bank.domains},
+        "responsible": {d: "PS committee" for d in bank.domains},
+        "review_date": {d: "2026-12-01" for d in bank.domains},
+    }
+
+def notes_scaling(sizes_kb=NOTES_SCALING_KB, repeat=1):
+    """Build the reports for each total notes size. Returns one dict per size
+    (notes characters, output sizes, best build time and time per KB of notes)."""
+    results = []
+    for kb in sizes_kb:
+        data = long_notes_evaluation(kb)
+        chars = sum(len(v) for v in data["notes"].values())
+        times = []
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            pdf_bytes, excel_bytes = build_reports(data)
+            times.append(time.perf_counter() - t0)
+        results.append({"notes_kb": kb, "notes_chars": chars, "pdf_bytes": len(pdf_bytes),
+                        "xlsx_bytes": len(excel_bytes), "build_s": min(times),
+                        "s_per_kb": min(times) / (chars / 1024), "pdf": pdf_bytes, "xlsx": excel_bytes})
+    return results
+
+
+# ================== EXTRACT ==================
+def pdf_content(pdf_bytes):
+    """Page count and text lines per page (build time masked)."""
+    from pypdf import PdfReader
+    pages = []
+    for page in PdfReader(BytesIO(pdf_bytes)).pages:
+        text = page.extract_text() or ""
+        for pattern, repl in _PDF_VOLATILE:
+            text = pattern.sub(repl, text)
+        pages.append(text.splitlines())
+    return {"page_count": len(pages), "pages": pages}
+
+def _cell_value(cell, shared):
+    t = cell.get("t", "n")
+    if t == "inlineStr":
+        return "".join(x.text or "" for x in cell.iter(f"{{{_NS['m']}}}t"))
+    v = cell.find("m:v", _NS)
+    if v is None:
+        return None
+    if t == "s":
+        return shared[int(v.text)]
+    if t == "b":
+        return v.text == "1"
+    if t in ("str", "e"):
+        return v.text
+    num = float(v.text)
+    return int(num) if num.is_integer() else num
+
+def xlsx_content(xlsx_bytes):
+    """Sheet names, non-empty cells per sheet ({ref: value}) and chart series ranges."""
+    z = zipfile.ZipFile(BytesIO(xlsx_bytes))
+    names = set(z.namelist())
+    shared = []
+    if "xl/sharedStrings.xml" in names:
+        shared = ["".join(t.text or "" for t in si.iter(f"{{{_NS['m']}}}t"))
+                  for si in ET.fromstring(z.read("xl/sharedStrings.xml")).findall("m:si", _NS)]
+    rels = {r.get("Id"): r.get("Target") for r in ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))}
+    sheets, cells = [], {}
+    for sheet in ET.fromstring(z.read("xl/workbook.xml")).find("m:sheets", _NS):
+        name = sheet.get("name")
+        target = rels[sheet.get(_REL_ID)].lstrip("/")
+        path = target if target.startswith("xl/") else "xl/" + target
+        sheets.append(name)
+        values = {}
+        for c in ET.fromstring(z.read(path)).iter(f"{{{_NS['m']}}}c"):
+            v = _cell_value(c, shared)
+            if v is not None and v != "":
+                values[c.get("r")] = v
+        cells[name] = values
+    charts = []
+    for part in sorted(n for n in names if re.fullmatch(r"xl/charts/chart\d+\.xml", n)):
+        plot = ET.fromstring(z.read(part)).find("c:chart/c:plotArea", _NS)
+        for chart in plot:
+            tag = chart.tag.rsplit("}", 1)[-1]
+            if not tag.endswith("Chart"):
+                continue
+            series = []
+            for ser in chart.findall("c:ser", _NS):
+                tx = ser.find("c:tx", _NS)
+                series.append({
+                    "name": "".join(tx.itertext()) if tx is not None else "",
+                    "categories": ser.findtext("c:cat//c:f", "", _NS),
+                    "values": ser.findtext("c:val//c:f", "", _NS),
+                })
+            charts.append({"type": tag, "series": series})
+    return {"sheets": sheets, "cells": cells, "charts": charts}
+
+def report_content(pdf_bytes, excel_bytes):
+    return {"pdf": pdf_content(pdf_bytes), "xlsx": xlsx_content(excel_bytes)}
+
+
+# ================== COMPARE ==================
+def _diff(expected, actual, path, out):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for k in list(expected) + [k for k in actual if k not in expected]:
+            if k not in actual:
+                out.append(f"{path}/{k}: missing")
+            elif k not in expected:
+                out.append(f"{path}/{k}: unexpected {actual[k]!r:.80}")
+            else:
+                _diff(expected[k], actual[k], f"{path}/{k}", out)
+    elif (isinstance(expected, list) and isinstance(actual, list)
+          and all(isinstance(x, str) for x in expected + actual)):
+        if expected != actual:
+            out.append(f"{path}:")
+            out.extend("  " + line for line in list(difflib.unified_diff(expected, actual, lineterm="", n=1))[2:])
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            out.append(f"{path}: {len(expected)} items expected, got {len(actual)}")
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            _diff(e, a, f"{path}[{i}]", out)
+    elif expected != actual:
+        out.append(f"{path}: expected {expected!r:.80}, got {actual!r:.80}")
+    return out
+
+def compare_content(expected, actual):
+    """Differences between two report contents, one line each (empty when equal)."""
+    return _diff(expected, actual, "", [])
+
+
+# ================== RUN ==================
+def list_fixtures(names=None):
+    found = sorted(f[:-5] for f in os.listdir(FIXTURE_DIR) if f.endswith(".json"))
+    if names:
+        missing = [n for n in names if n not in found]
+        if missing:
+            raise SystemExit(f"Unknown fixture(s): {', '.join(missing)}")
+        found = [n for n in found if n in names]
+    return found
+
+def run_fixture(name, repeat=3, update=False):
+    """Build one fixture, compare it with its snapshot and measure it. Returns a result dict."""
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        fixture = json.load(f)
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        pdf_bytes, excel_bytes = build_reports(fixture)
+        times.append(time.perf_counter() - t0)
+    # Separate traced build: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        build_reports(fixture)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    content = report_content(pdf_bytes, excel_bytes)
+    snapshot_path = os.path.join(SNAPSHOT_DIR, f"{name}.json")
+    diffs = []
+    if update:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        with open(snapshot_path, "w", encoding="utf-8") as f:
+            json.dump(content, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        status = "updated"
+    elif not os.path.exists(snapshot_path):
+        status = "no snapshot"
+    else:
+        with open(snapshot_path, encoding="utf-8") as f:
+            diffs = compare_content(json.load(f), content)
+        status = "CHANGED" if diffs else "ok"
+    return {
+        "fixture": name,
+        "status": status,
+        "diffs": diffs,
+        "pages": content["pdf"]["page_count"],
+        "pdf_bytes": len(pdf_bytes),
+        "xlsx_bytes": len(excel_bytes),
+        "build_s": min(times),
+        "peak_mb": peak / 1e6,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check PDF/Excel reports against golden snapshots and time them.")
+    parser.add_argument("fixtures", nargs="*", help="fixture names (default: all in golden/fixtures)")
+    parser.add_argument("-u", "--update", action="store_true", help="write the current output as the new snapshots")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed builds per fixture (best is reported)")
+    parser.add_argument("--perf-out", help="write timing/memory results to this JSON file")
+    parser.add_argument("--perf-baseline", help="earlier --perf-out file to compare build times with")
+    parser.add_argument("--notes-scaling", action="store_true", help="time report builds with 64 KB to 1 MB of notes")
+    args = parser.parse_args(argv)
+
+    if args.notes_scaling:
+        print(f"{'notes KB':>8} {'pdf KB':>8} {'xlsx KB':>8} {'build ms':>9} {'ms/notes KB':>12}")
+        for r in notes_scaling(repeat=args.repeat):
+            print(f"{r['notes_kb']:>8} {r['pdf_bytes']/1024:>8.1f} {r['xlsx_bytes']/1024:>8.1f}"
+                  f" {r['build_s']*1000:>9.1f} {r['s_per_kb']*1000:>12.3f}")
+        return 0
+
+    baseline = {}
+    if args.perf_baseline:
+        with open(args.perf_baseline, encoding="utf-8") as f:
+            baseline = {r["fixture"]: r for r in json.load(f)}
+    results = []
+    print(f"{'fixture':<22} {'status':<11} {'pages':>5} {'pdf KB':>8} {'xlsx KB':>8} {'build ms':>9} {'peak MB':>8}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    for name in list_fixtures(args.fixtures):
+        r = run_fixture(name, repeat=args.repeat, update=args.update)
+        results.append(r)
+        line = (f"{name:<22} {r['status']:<11} {r['pages']:>5} {r['pdf_bytes']/1024:>8.1f} {r['xlsx_bytes']/1024:>8.1f}"
+                f" {r['build_s']*1000:>9.1f} {r['peak_mb']:>8.1f}")
+        if name in baseline:
+            line += f" {r['build_s'] / baseline[name]['build_s']:>7.2f}x"
+        print(line)
+        for d in r["diffs"][:MAX_DIFF_LINES]:
+            print(f"    {d}")
+        if len(r["diffs"]) > MAX_DIFF_LINES:
+            print(f"    ... {len(r['diffs']) - MAX_DIFF_LINES} more")
+    if args.perf_out:
+        with open(args.perf_out, "w", encoding="utf-8") as f:
+            json.dump([{k: v for k, v in r.items() if k != "diffs"} for r in results], f, indent=1)
+    failed = [r["fixture"] for r in results if r["status"] in ("CHANGED", "no snapshot")]
+    if failed:
+        print(f"\n{len(failed)} fixture(s) differ from their snapshot or have none: {', '.join(failed)}"
+              + ("" if args.update else " (run with --update to accept)"))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# Columnar evaluation history.
+# Evaluations (the JSON download schema) are flattened once into two Arrow
+# tables -- one row per question and one row per domain -- and appended to a
+# hive-partitioned dataset (year=/country=/project=). Analysts then read it
+# back memory-mapped, loading only the columns and partitions they ask for.
+import os
+import sys
+import json
+import uuid
+import hashlib
+import time
+import argparse
+from datetime import date, datetime
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from pspa_reports import get_ranking, score_evaluation
+
+PARTITION_COLUMNS = ["year", "country", "project"]
+ROWS_PER_GROUP = 1 << 20
+# Exports merge a touched partition once it holds this many files of the
+# format: scan time grows with the file count, and waiting for someone to run
+# `compact` let every appended batch slow reads down
+COMPACT_AT_FILES = 2
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("country", pa.string()), ("project", pa.string())]),
+    flavor="hive",
+)
+
+_COMMON_FIELDS = [
+    ("evaluation_id", pa.string()),
+    ("evaluated_at", pa.timestamp("s")),
+    ("year", pa.int16()),
+    ("country", pa.string()),
+    ("project", pa.string()),
+    ("domain", pa.string()),
+]
+
+QUESTIONS_SCHEMA = pa.schema(_COMMON_FIELDS + [
+    ("question_number", pa.string()),
+    ("question", pa.string()),
+    ("score", pa.float64()),
+    ("notes", pa.string()),
+])
+
+DOMAINS_SCHEMA = pa.schema(_COMMON_FIELDS + [
+    ("score", pa.float64()),
+    ("ranking", pa.string()),
+    ("lowest_questions", pa.string()),
+    ("iap_action", pa.string()),
+    ("iap_responsible", pa.string()),
+    ("iap_review_date", pa.string()),
+])
+
+TABLES = {"questions": QUESTIONS_SCHEMA, "domains": DOMAINS_SCHEMA}
+FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+
+
+def _evaluation_id(data):
+    # Content hash: re-exporting the same evaluation yields the same id
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def _evaluated_at(data, default=None):
+    v = data.get("evaluation_date") or default
+    if isinstance(v, datetime):
+        return v.replace(microsecond=0)
+    if isinstance(v, date):
+        return datetime(v.year, v.month, v.day)
+    if v:
+        try:
+            return datetime.fromisoformat(str(v)).replace(microsecond=0)
+        except ValueError:
+            pass
+    return datetime.now().replace(microsecond=0)
+
+def flatten_evaluations(evaluations, domains=None, country=None, evaluated_at=None):
+    """Flatten evaluation dicts into (questions, domains) column dicts.
+
+    `country` and `evaluated_at` are used when an evaluation does not carry
+    its own "country" / "evaluation_date" field."""
+    qcols = {f.name: [] for f in QUESTIONS_SCHEMA}
+    dcols = {f.name: [] for f in DOMAINS_SCHEMA}
+    for data in evaluations:
+        domain_scores, lowest_questions, questions_data, iap = score_evaluation(data, domains)
+        common = {
+            "evaluation_id": _evaluation_id(data),
+            "evaluated_at": _evaluated_at(data, evaluated_at),
+            "country": data.get("country") or country or "Unknown",
+            "project": data.get("project_name") or "Project",
+        }
+        common["year"] = common["evaluated_at"].year
+        for row in questions_data:
+            for k, v in common.items():
+                qcols[k].append(v)
+            q_num, _, q_text = str(row["Question"]).partition(" ")
+            qcols["domain"].append(row["Domain"])
+            qcols["question_number"].append(q_num)
+            qcols["question"].append(q_text)
+            qcols["score"].append(row["Score"])
+            qcols["notes"].append(row["Notes"])
+        for d, s in domain_scores.items():
+            for k, v in common.items():
+                dcols[k].append(v)
+            plan = iap.get(d, {})
+            dcols["domain"].append(d)
+            dcols["score"].append(s)
+            dcols["ranking"].append(get_ranking(s))
+            dcols["lowest_questions"].append(lowest_questions.get(d, ""))
+            dcols["iap_action"].append(plan.get("action", ""))
+            dcols["iap_responsible"].append(plan.get("responsible", ""))
+            dcols["iap_review_date"].append(str(plan.get("review_date", "")))
+    return qcols, dcols
+
+def _table_files(table_root, fmt):
+    # Only this format's files: a root may also hold the other format's
+    # exports, which pyarrow would otherwise try (and fail) to parse
+    files = []
+    for dirpath, dirnames, filenames in os.walk(table_root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")))
+        files.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                     if f.endswith(f".{fmt}") and not f.startswith((".", "_")))
+    return files
+
+def _table_dataset(table_root, fmt, **kwargs):
+    return ds.dataset(_table_files(table_root, fmt), format=FORMATS[fmt], partitioning=_PARTITIONING,
+                      partition_base_dir=table_root, **kwargs)
+
+def export_evaluations(evaluations, root, fmt="parquet", domains=None, country=None, evaluated_at=None):
+    """Append a batch of evaluations to the dataset under `root`.
+
+    Each call writes new files (unique basename) into the matching
+    year/country/project partitions; a touched partition that then holds
+    `COMPACT_AT_FILES` or more files of the format is merged into one.
+    Returns the number of question rows written."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {sorted(FORMATS)}")
+    qcols, dcols = flatten_evaluations(evaluations, domains=domains, country=country, evaluated_at=evaluated_at)
+    batch = uuid.uuid4().hex[:12]
+    for name, cols in (("questions", qcols), ("domains", dcols)):
+        table = pa.table(cols, schema=TABLES[name])
+        if not len(table):
+            continue
+        touched = set()
+        ds.write_dataset(
+            table, os.path.join(root, name), format=FORMATS[fmt],
+            partitioning=_PARTITIONING,
+            basename_template=f"part-{batch}-{{i}}.{fmt}",
+            existing_data_behavior="overwrite_or_ignore",
+            min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP,
+            file_visitor=lambda written: touched.add(os.path.dirname(written.path)),
+        )
+        for part_dir in sorted(touched):
+            files = _table_files(part_dir, fmt)
+            if len(files) >= COMPACT_AT_FILES:
+                _compact_partition(part_dir, files, fmt, _file_schema(name))
+    return len(qcols["evaluation_id"])
+
+def _file_schema(table):
+    # Partition columns live in the directory names, not in the files
+    return pa.schema([f for f in TABLES[table] if f.name not in PARTITION_COLUMNS])
+
+def _compact_partition(part_dir, files, fmt, file_schema):
+    # One large row group per file: per-group overhead dominates small scans
+    merged = ds.dataset(files, format=FORMATS[fmt], schema=file_schema).to_table().combine_chunks()
+    # New file lands before the old ones go, so a crash never loses rows
+    ds.write_dataset(
+        merged, part_dir, format=FORMATS[fmt], schema=file_schema,
+        basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.{fmt}",
+        existing_data_behavior="overwrite_or_ignore",
+        min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP,
+    )
+    for path in files:
+        os.remove(path)
+
+def compact_history(root, fmt="parquet"):
+    """Merge the per-batch files of every partition into a single file.
+
+    Exports already merge the partitions they touch (see COMPACT_AT_FILES);
+    this catches up on datasets written with a higher threshold or by other
+    tools. Returns the number of files removed."""
+    removed = 0
+    for name in TABLES:
+        table_root = os.path.join(root, name)
+        if not os.path.isdir(table_root):
+            continue
+        by_dir = {}
+        for path in _table_dataset(table_root, fmt).files:
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+        for part_dir, files in by_dir.items():
+            if len(files) < 2:
+                continue
+            _compact_partition(part_dir, files, fmt, _file_schema(name))
+            removed += len(files) - 1
+    return removed
+
+def open_history(root, table="questions", fmt="parquet"):
+    """Open one history table as a memory-mapped pyarrow Dataset (no data is read yet)."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {sorted(TABLES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {sorted(FORMATS)}")
+    return _table_dataset(os.path.join(root, table), fmt, schema=TABLES[table],
+                          filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+def read_history(root, table="questions", columns=None, where=None, fmt="parquet"):
+    """Read a history table, loading only `columns` and the rows matching `where`.
+
+    `where` is either a pyarrow compute expression or a dict of column ->
+    value (or list of values); filters on year/country/project prune whole
+    partitions before any file is opened."""
+    dataset = open_history(root, table, fmt=fmt)
+    expr = where
+    if isinstance(where, dict):
+        expr = None
+        for col, val in where.items():
+            term = ds.field(col).isin(val) if isinstance(val, (list, tuple, set)) else ds.field(col) == val
+            expr = term if expr is None else expr & term
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def benchmark(root, evaluations=36000, projects=200, batches=4, fmt="parquet", columns=("project", "score")):
+    """Append `evaluations` synthetic evaluations spread over `projects`
+    projects in `batches` exports, then time a read of `columns` (the
+    normal append workflow, no explicit compaction). Returns a stats dict."""
+    from pspa_loadtest import sample_evaluation
+    per_batch = -(-evaluations // batches)
+    rows = export_s = 0.0
+    for b in range(batches):
+        batch = []
+        for i in range(b * per_batch, min(evaluations, (b + 1) * per_batch)):
+            data = sample_evaluation(i)
+            data.update(project_name=f"Project {i % projects}", country="Benchmark",
+                        evaluation_date=f"2025-{1 + i % 12:02d}-01")
+            batch.append(data)
+        t0 = time.perf_counter()
+        rows += export_evaluations(batch, root, fmt=fmt)
+        export_s += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    table = read_history(root, columns=list(columns), fmt=fmt)
+    read_s = time.perf_counter() - t0
+    return {"rows": int(rows), "files": len(_table_files(os.path.join(root, "questions"), fmt)),
+            "export_s": round(export_s, 3), "read_s": round(read_s, 3), "read_rows": table.num_rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PSPA evaluation history (Parquet/Arrow dataset).")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export", help="append evaluation JSON files to the dataset")
+    p_exp.add_argument("root")
+    p_exp.add_argument("inputs", nargs="+", help="evaluation .json files or directories containing them")
+    p_exp.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    p_exp.add_argument("--country", help="country for evaluations that do not carry one")
+    p_cmp = sub.add_parser("compact", help="merge each partition's batch files into one")
+    p_cmp.add_argument("root")
+    p_cmp.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    p_read = sub.add_parser("read", help="print a summary of a history table")
+    p_read.add_argument("root")
+    p_read.add_argument("--table", choices=sorted(TABLES), default="questions")
+    p_read.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    p_read.add_argument("--columns", help="comma-separated column list")
+    p_bench = sub.add_parser("bench", help="time reads after appending synthetic batches")
+    p_bench.add_argument("root", help="empty directory to write the benchmark dataset to")
+    p_bench.add_argument("--evaluations", type=int, default=36000, help="~28 question rows each")
+    p_bench.add_argument("--projects", type=int, default=200)
+    p_bench.add_argument("--batches", type=int, default=4)
+    p_bench.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        from pspa_portfolio import iter_evaluation_files
+        n = export_evaluations(iter_evaluation_files(args.inputs), args.root, fmt=args.format, country=args.country)
+        print(f"{n} question rows appended to {args.root}")
+    elif args.cmd == "bench":
+        print(json.dumps(benchmark(args.root, args.evaluations, args.projects, args.batches, args.format)))
+    elif args.cmd == "compact":
+        print(f"{compact_history(args.root, fmt=args.format)} files merged away")
+    else:
+        columns = args.columns.split(",") if args.columns else None
+        table = read_history(args.root, args.table, columns=columns, fmt=args.format)
+        print(f"{table.num_rows} rows")
+        print(table.slice(0, 10).to_pandas().to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
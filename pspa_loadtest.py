@@ -0,0 +1,110 @@
+# Load test for the local PSPA API (pspa_api.py).
+# Starts an in-process server (or targets --url), fires N requests with C
+# concurrent clients and prints throughput and latency percentiles.
+#
+#   python pspa_loadtest.py --endpoint /report/pdf -n 200 -c 8 --unique 0.5
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pspa_reports import load_question_bank
+
+
+def sample_evaluation(seed, bank=None):
+    """Deterministic evaluation payload (dashboard JSON schema) for `seed`."""
+    bank = bank or load_question_bank()
+    rnd = random.Random(seed)
+    return {
+        "project_name": f"Load test project {seed}",
+        "project_objectives": "Synthetic evaluation for load testing",
+        "question_bank": bank.key,
+        "scores": {f"slider_{qid}": rnd.randint(0, 10) for qid, _, _ in bank.questions},
+        "notes": {f"note_{qid}": f"Observation {seed}-{qid}" for qid, _, _ in bank.questions[::3]},
+        "improvements": {d: "Weekly huddles and audit feedback" for d in bank.domains},
+        "responsible": {d: "PS committee" for d in bank.domains},
+        "review_date": {d: "2026-12-01" for d in bank.domains},
+    }
+
+def _percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+def run_load(url, endpoint="/score", requests=200, concurrency=8, unique=1.0, seed=0):
+    """Send `requests` POSTs; a fraction `unique` of them carry distinct payloads
+    (the rest repeat earlier ones and exercise the cache). Returns a stats dict."""
+    rnd = random.Random(seed)
+    n_unique = max(1, int(requests * unique))
+    bodies = [json.dumps(sample_evaluation(i)).encode("utf-8") for i in range(n_unique)]
+    plan = [bodies[i if i < n_unique else rnd.randrange(n_unique)] for i in range(requests)]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def one(body):
+        req = urllib.request.Request(url + endpoint, data=body, headers={"Content-Type": "application/json"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = "error"
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, plan))
+    elapsed = time.perf_counter() - t_start
+    lat = sorted(latencies)
+    return {
+        "endpoint": endpoint, "requests": requests, "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3), "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(lat, 50) * 1000, 1), "p95_ms": round(_percentile(lat, 95) * 1000, 1),
+        "p99_ms": round(_percentile(lat, 99) * 1000, 1), "max_ms": round(lat[-1] * 1000, 1) if lat else 0.0,
+        "statuses": statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the PSPA API.")
+    parser.add_argument("--url", help="running server (default: start one in-process)")
+    parser.add_argument("--endpoint", default="all", help="/score, /report/pdf, /report/xlsx or all")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--unique", type=float, default=1.0, help="fraction of distinct payloads (rest hit the cache)")
+    parser.add_argument("--workers", type=int, default=4, help="in-process server workers")
+    parser.add_argument("--queue", type=int, default=32, help="in-process server queue slots")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if not url:
+        from pspa_api import make_server
+        server = make_server("127.0.0.1", 0, workers=args.workers, queue_size=args.queue)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    endpoints = ["/score", "/report/pdf", "/report/xlsx"] if args.endpoint == "all" else [args.endpoint]
+    try:
+        for ep in endpoints:
+            stats = run_load(url, ep, args.requests, args.concurrency, args.unique)
+            print(json.dumps(stats))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            server.service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# Consolidated multi-project portfolio PDF.
+# One document for a whole network review: per project a summary page (domain
+# scores, ranking colors, radar) followed by its appendix (IAP + question
+# details). Fonts, the logo and layout caches are shared by every section and
+# each finished page is written to the output stream right away, so memory
+# stays flat however many projects are included.
+import os
+import sys
+import json
+import math
+import argparse
+import functools
+from pspa_reports import (
+    PSPAPDF, RAICESP_URL, get_ranking, score_evaluation, _latin1,
+    _ranking_rgb, _pdf_ensure_space, _pdf_summary_section, _pdf_iap_section,
+    _pdf_details_section,
+)
+
+
+class _StreamingPDF(PSPAPDF):
+    """PSPAPDF that writes every finished page straight to a binary stream.
+
+    FPDF 1.7 keeps all page contents in memory until output(); here each page
+    object is emitted when the page ends and only the shared resources (fonts,
+    images), the page tree and the xref table are written at the end.
+    Only URI links are supported: an internal link may point at a page that
+    has not been written yet, so a page carrying one raises ValueError."""
+
+    def __init__(self, stream, project_name="Portfolio", raicesp_url=None):
+        super().__init__(project_name, raicesp_url=raicesp_url)
+        self._stream = stream
+        self._written = 0
+        self._page_objs = []
+
+    def footer(self):
+        # Total page count is unknown while streaming
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.set_text_color(100)
+        self.cell(0, 10, _latin1(f"PSPA Tool version 1.2 | Page {self.page_no()} | bit.ly/raicesp"), 0, 0, "C", link=self.raicesp_url)
+
+    def _newobj(self):
+        # Offsets are absolute: the buffer only holds what was not flushed yet
+        self.n += 1
+        self.offsets[self.n] = self._written + len(self.buffer)
+        self._out(str(self.n) + ' 0 obj')
+
+    def _flush(self):
+        if self.buffer:
+            data = self.buffer.encode("latin-1")
+            self._stream.write(data)
+            self._written += len(data)
+            self.buffer = ''
+
+    def _endpage(self):
+        super()._endpage()
+        if not self._written:
+            self._putheader()
+        self._put_page(self.page)
+        self._flush()
+
+    def _put_page(self, n):
+        self._newobj()
+        self._page_objs.append(self.n)
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        self._out('/Resources 2 0 R')
+        links = self.page_links.pop(n, None) if self.page_links else None
+        if links and not all(isinstance(pl[4], str) for pl in links):
+            raise ValueError(f"Internal links are not supported by the streaming PDF writer (page {n})")
+        if links:
+            annots = '/Annots ['
+            for pl in links:
+                if isinstance(pl[4], str):
+                    rect = '%.2f %.2f %.2f %.2f' % (pl[0], pl[1], pl[0]+pl[2], pl[1]-pl[3])
+                    annots += '<</Type /Annot /Subtype /Link /Rect ['+rect+'] /Border [0 0 0] '
+                    annots += '/A <</S /URI /URI '+self._textstring(pl[4])+'>>>>'
+            self._out(annots+']')
+        self._out('/Contents '+str(self.n+1)+' 0 R>>')
+        self._out('endobj')
+        content = self.pages[n].encode("latin-1")
+        self.pages[n] = ''
+        if self.compress:
+            import zlib
+            content = zlib.compress(content)
+        self._newobj()
+        self._out('<<'+('/Filter /FlateDecode ' if self.compress else '')+'/Length '+str(len(content))+'>>')
+        self._putstream(content)
+        self._out('endobj')
+
+    def _enddoc(self):
+        # Page tree
+        self.offsets[1] = self._written + len(self.buffer)
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids ['+' '.join(f'{n} 0 R' for n in self._page_objs)+' ]')
+        self._out('/Count '+str(len(self._page_objs)))
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fw_pt, self.fh_pt))
+        self._out('>>')
+        self._out('endobj')
+        # Shared resources: every page points at the same fonts and images
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self._written + len(self.buffer)
+        self._out('2 0 obj')
+        self._out('<<')
+        self._putresourcedict()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._out('/Type /Catalog')
+        self._out('/Pages 1 0 R')
+        self._out('>>')
+        self._out('endobj')
+        o = self._written + len(self.buffer)
+        self._out('xref')
+        self._out('0 '+str(self.n+1))
+        self._out('0000000000 65535 f ')
+        for i in range(1, self.n+1):
+            self._out('%010d 00000 n ' % self.offsets[i])
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(o)
+        self._out('%%EOF')
+        self.state = 3
+        self._flush()
+
+
+# ================== RADAR (vector) ==================
+@functools.lru_cache(maxsize=16)
+def _radar_directions(n):
+    # Unit vectors clockwise from 12 o'clock, shared by every radar in the document
+    return tuple((math.sin(2*math.pi*i/n), -math.cos(2*math.pi*i/n)) for i in range(n))
+
+def _pdf_polygon(pdf, points, style):
+    # Closed path in user units; style "S" = stroke, "B" = fill + stroke
+    k, h = pdf.k, pdf.h
+    ops = [f"{x*k:.2f} {(h-y)*k:.2f} {'m' if i == 0 else 'l'}" for i, (x, y) in enumerate(points)]
+    pdf._out(" ".join(ops) + " h " + style)
+
+def _pdf_radar(pdf, domain_scores, r=28):
+    # Vector radar (a few hundred bytes) instead of one raster image per project
+    n = len(domain_scores)
+    if n < 3:
+        return
+    _pdf_ensure_space(pdf, 2*r + 20)
+    cx, cy = pdf.w / 2, pdf.get_y() + r + 8
+    dirs = _radar_directions(n)
+    pdf.set_line_width(0.2)
+    pdf.set_draw_color(190)
+    for ring in (2, 4, 6, 8, 10):
+        _pdf_polygon(pdf, [(cx + dx*r*ring/10, cy + dy*r*ring/10) for dx, dy in dirs], "S")
+    for dx, dy in dirs:
+        pdf.line(cx, cy, cx + dx*r, cy + dy*r)
+    pdf.set_line_width(0.6)
+    pdf.set_draw_color(31, 78, 121)
+    pdf.set_fill_color(143, 170, 220)
+    values = [max(0.0, min(10.0, float(s))) / 10 for s in domain_scores.values()]
+    _pdf_polygon(pdf, [(cx + dx*r*v, cy + dy*r*v) for (dx, dy), v in zip(dirs, values)], "B")
+    pdf.set_font("Arial", "", 8)
+    pdf.set_text_color(0, 0, 0)
+    for (dx, dy), d in zip(dirs, domain_scores):
+        pdf.text(cx + dx*(r+4) - 1, cy + dy*(r+4) + 1, _latin1(d.split('.')[0]))
+    pdf.set_line_width(0.2)
+    pdf.set_draw_color(0)
+    pdf.set_y(cy + r + 8)
+
+
+# ================== PORTFOLIO ==================
+def iter_evaluation_files(paths):
+    """Yield evaluation dicts lazily from JSON files and/or directories of JSON files."""
+    for p in paths:
+        if os.path.isdir(p):
+            files = sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(".json"))
+        else:
+            files = [p]
+        for f in files:
+            with open(f, encoding="utf-8") as fh:
+                yield json.load(fh)
+
+def _overview_section(pdf, rows):
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 10, _latin1("Portfolio Overview"), ln=True)
+    pdf.set_font("Arial", "B", 10)
+    pdf.cell(110, 7, _latin1("Project"), border=1)
+    pdf.cell(25, 7, _latin1("Mean"), border=1, align="C")
+    pdf.cell(0, 7, _latin1("Ranking"), border=1, ln=True, align="C")
+    pdf.set_font("Arial", "", 10)
+    for name, mean in rows:
+        ranking = get_ranking(mean)
+        pdf.cell(110, 7, _latin1(name[:60]), border=1)
+        pdf.cell(25, 7, f"{mean:.1f}", border=1, align="C")
+        pdf.set_fill_color(*_ranking_rgb(ranking))
+        pdf.cell(0, 7, _latin1(ranking), border=1, ln=True, align="C", fill=True)
+
+def build_portfolio_pdf(evaluations, out, domains=None, overview=True):
+    """Write one PDF covering every evaluation in `evaluations` to `out`.
+
+    `evaluations` is any iterable of evaluation dicts (the JSON download
+    schema) and is consumed one project at a time; `out` is a path or a
+    binary file-like object. Returns the number of projects rendered."""
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "wb") as fh:
+            return build_portfolio_pdf(evaluations, fh, domains=domains, overview=overview)
+
+    pdf = _StreamingPDF(out, raicesp_url=RAICESP_URL)
+    pdf.set_auto_page_break(auto=True, margin=15)
+    rows = []
+    for data in evaluations:
+        name = data.get("project_name") or "Project"
+        domain_scores, lowest_questions, questions_data, iap = score_evaluation(data, domains)
+
+        # Summary page
+        pdf.project_name = name
+        pdf.add_page()
+        _pdf_summary_section(pdf, domain_scores, lowest_questions)
+        pdf.ln(2)
+        _pdf_radar(pdf, domain_scores)
+
+        # Appendix
+        pdf.project_name = f"{name} - Appendix"
+        pdf.add_page()
+        _pdf_iap_section(pdf, domain_scores, iap)
+        pdf.ln(2)
+        _pdf_details_section(pdf, domain_scores, questions_data)
+
+        scores = list(domain_scores.values())
+        rows.append((name, sum(scores) / len(scores) if scores else 0.0))
+
+    if overview and rows:
+        pdf.project_name = "Portfolio"
+        pdf.add_page()
+        _overview_section(pdf, rows)
+    pdf.close()
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build one PSPA portfolio PDF from many evaluation JSON files.")
+    parser.add_argument("inputs", nargs="+", help="evaluation .json files or directories containing them")
+    parser.add_argument("-o", "--output", default="PSPA_portfolio.pdf", help="output PDF path")
+    parser.add_argument("--no-overview", action="store_true", help="omit the closing overview table")
+    args = parser.parse_args(argv)
+    n = build_portfolio_pdf(iter_evaluation_files(args.inputs), args.output, overview=not args.no_overview)
+    print(f"{n} projects written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,693 @@
+
+# Scoring and report builders shared by the dashboard and the headless tools
+# (portfolio PDF, exports). Importing this module does not render any UI.
+import streamlit as st
+import pandas as pd
+import numpy as np
+import io
+from fpdf import FPDF
+from datetime import date, datetime
+import os
+import functools
+from types import MappingProxyType
+
+def _secret(name, default):
+    # st.secrets raises when no secrets.toml exists (e.g. headless runs)
+    try:
+        return st.secrets[name] if name in st.secrets else default
+    except Exception:
+        return default
+
+RAICESP_URL = _secret('RAICESP_URL', 'https://bit.ly/raicesp')
+RAICESP_LOGO = 'https://raw.githubusercontent.com/JValMar/PSPA-Tool/main/RAICESP_eng_imresizer.jpg'
+
+# ================== UTILS ==================
+def get_ranking(score):
+    if score < 2:
+        return "Very Low"
+    elif score < 4:
+        return "Low"
+    elif score < 6:
+        return "Average"
+    elif score < 8:
+        return "High"
+    else:
+        return "Very High"
+
+ranking_colors = {
+    "Very Low": "#ff4d4d",
+    "Low": "#ff944d",
+    "Average": "#ffeb3b",
+    "High": "#81c784",
+    "Very High": "#42a5f5"
+}
+
+# PDF fill colors, parsed from the hex values once per process
+RANKING_RGB = MappingProxyType({k: tuple(int(v.lstrip('#')[i:i+2], 16) for i in (0,2,4)) for k, v in ranking_colors.items()})
+
+# ================== QUESTION BANKS ==================
+# Checklists live in versioned JSON files (question_banks/<id>_v<version>.json)
+# and are compiled once per process into an indexed QuestionBank.
+QUESTION_BANK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_banks")
+DEFAULT_QUESTION_BANK = "pspa_v1.2"
+
+def _question_number(domain, i):
+    return f"{domain.split('.')[0]}.{i}"
+
+class QuestionBank:
+    """A compiled checklist: ordered domains plus a question-id index.
+
+    `domains` keeps the plain {domain: [question text, ...]} view used by the
+    reports; `questions` lists (question id, domain, text) in display order,
+    `index` maps a question id to its position and `domain_slices` maps each
+    domain to its (start, stop) range in `questions`."""
+
+    def __init__(self, key, title, version, domains):
+        self.key = key
+        self.title = title
+        self.version = version
+        self.domains = {}
+        self.questions = []
+        self.index = {}
+        self.domain_slices = {}
+        for domain, qs in domains:
+            start = len(self.questions)
+            for qid, text in qs:
+                if qid in self.index:
+                    raise ValueError(f"Duplicate question id {qid!r} in question bank {key!r}")
+                self.index[qid] = len(self.questions)
+                self.questions.append((qid, domain, text))
+            self.domain_slices[domain] = (start, len(self.questions))
+            self.domains[domain] = [text for _, text in qs]
+
+    def domain_questions(self, domain):
+        # [(question id, text), ...] for one domain, in display order
+        start, stop = self.domain_slices[domain]
+        return [(qid, text) for qid, _, text in self.questions[start:stop]]
+
+    def domain_of(self, qid):
+        return self.questions[self.index[qid]][1]
+
+    def __len__(self):
+        return len(self.questions)
+
+def compile_question_bank(spec, key=None):
+    """Compile a question-bank spec ({"domains": [{"name", "questions"}]} or a plain
+    {domain: [question, ...]} dict). Questions are strings or {"id", "text"} dicts;
+    missing ids default to "<domain number>.<position>"."""
+    if isinstance(spec.get("domains"), list):
+        raw = [(d["name"], d.get("questions", [])) for d in spec["domains"]]
+        version = str(spec.get("version", ""))
+        key = key or f"{spec.get('id', 'bank')}_v{version}"
+        title = spec.get("title", key)
+    else:
+        raw = list(spec.items())
+        version = ""
+        key = title = key or "custom"
+    domains = []
+    for domain, qs in raw:
+        compiled = []
+        for i, q in enumerate(qs, start=1):
+            if isinstance(q, dict):
+                compiled.append((str(q.get("id") or _question_number(domain, i)), q["text"]))
+            else:
+                compiled.append((_question_number(domain, i), q))
+        domains.append((domain, compiled))
+    return QuestionBank(key, title, version, domains)
+
+def list_question_banks():
+    # Bank names (file stems) available in QUESTION_BANK_DIR, default first
+    try:
+        names = sorted(f[:-5] for f in os.listdir(QUESTION_BANK_DIR) if f.endswith(".json"))
+    except OSError:
+        names = []
+    return sorted(names, key=lambda n: n != DEFAULT_QUESTION_BANK)
+
+@functools.lru_cache(maxsize=32)
+def _load_question_bank_file(path, mtime):
+    # mtime is part of the cache key so an edited bank file is recompiled
+    import json
+    with open(path, encoding="utf-8") as f:
+        return compile_question_bank(json.load(f), key=os.path.basename(path)[:-5])
+
+def load_question_bank(name=None):
+    """Load a bank by name (file stem in QUESTION_BANK_DIR) or path; cached per process."""
+    name = name or DEFAULT_QUESTION_BANK
+    path = name if name.endswith(".json") else os.path.join(QUESTION_BANK_DIR, f"{name}.json")
+    return _load_question_bank_file(os.path.abspath(path), os.path.getmtime(path))
+
+def _as_question_bank(domains):
+    if domains is None:
+        return load_question_bank()
+    if isinstance(domains, QuestionBank):
+        return domains
+    if isinstance(domains, str):
+        # Bank name recorded in an evaluation; unknown names fall back to the default
+        return load_question_bank(domains if domains in list_question_banks() else None)
+    return compile_question_bank(domains)
+
+DOMAINS = load_question_bank().domains
+
+def _summarize_domain(questions, scores):
+    # Average score (1 decimal) and the comma-joined lowest-rated questions;
+    # `questions` is [(question id, text), ...] aligned with `scores`
+    avg_score = round(float(np.mean(scores)), 1) if len(scores) else 0.0
+    min_score = min(scores) if len(scores) else 10
+    min_questions = [f"{questions[i][0]} {questions[i][1]}" for i, s in enumerate(scores) if s == min_score]
+    return avg_score, ", ".join(min_questions)
+
+def _as_score(v, default=5):
+    # Whole numbers as int, anything else (e.g. a 5.5 consensus median) stays float
+    try:
+        f = float(v)
+    except Exception:
+        return default
+    return int(f) if f.is_integer() else f
+
+def _session_iap(domain_names):
+    # IAP fields for each domain as currently held by the Streamlit session
+    return {d: {"action": st.session_state.get(f"improve-{d}", ""),
+                "responsible": st.session_state.get(f"resp-{d}", ""),
+                "review_date": st.session_state.get(f"date-{d}", date.today())}
+            for d in domain_names}
+
+def score_evaluation(data, domains=None):
+    """Score an evaluation dict (the JSON download schema) exactly like the dashboard.
+
+    `domains` is a QuestionBank, a bank name, a plain {domain: [question, ...]}
+    dict or None for the bank recorded in the evaluation (default bank otherwise). Returns (domain_scores, lowest_questions,
+    questions_data, iap)."""
+    bank = _as_question_bank(domains if domains is not None else data.get("question_bank"))
+    scores = data.get("scores") or {}
+    notes = data.get("notes") or {}
+    improvements = data.get("improvements") or {}
+    responsible = data.get("responsible") or {}
+    review_date = data.get("review_date") or {}
+    questions_data, domain_scores, lowest_questions, iap = [], {}, {}, {}
+    for domain in bank.domains:
+        qs = bank.domain_questions(domain)
+        dom_scores = []
+        for q_num, q in qs:
+            score = _as_score(scores.get(f"slider_{q_num}", 5))
+            dom_scores.append(score)
+            questions_data.append({"Domain": domain, "Question": f"{q_num} {q}", "Score": score, "Notes": notes.get(f"note_{q_num}", "") or ""})
+        domain_scores[domain], lowest_questions[domain] = _summarize_domain(qs, dom_scores)
+        iap[domain] = {"action": improvements.get(domain, "") or "",
+                       "responsible": responsible.get(domain, "") or "",
+                       "review_date": review_date.get(domain, "") or ""}
+    return domain_scores, lowest_questions, questions_data, iap
+
+def _summary_frame(domain_scores, iap, agreement=None):
+    # Summary table used by the dashboard view and the Excel report; `agreement`
+    # ({domain: {column: value}}, multi-assessor panels) adds columns after Score
+    df = pd.DataFrame({
+        "Domain": list(domain_scores.keys()),
+        "Score": [round(s, 1) for s in domain_scores.values()],
+        "Improvement Action Plan": [iap.get(d, {}).get("action", "") for d in domain_scores],
+        "IAP Responsible": [iap.get(d, {}).get("responsible", "") for d in domain_scores],
+        "IAP Review Date": [iap.get(d, {}).get("review_date", date.today()) for d in domain_scores]
+    })
+    if agreement:
+        cols = list(next(iter(agreement.values())))
+        for i, c in enumerate(cols):
+            df.insert(2 + i, c, [agreement.get(d, {}).get(c) for d in domain_scores])
+    return df
+
+# Logo helpers: fetched, downsampled and written once per process so every
+# PDF page (and the Excel sheet) references the same small image object.
+RAICESP_LOGO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RAICESP_eng_imresizer.jpg")
+PDF_LOGO_WIDTH_MM = 18
+PDF_LOGO_DPI = 150
+
+@functools.lru_cache(maxsize=1)
+def _logo_bytes():
+    # Bundled copy first, remote URL as fallback; None if neither is reachable
+    try:
+        with open(RAICESP_LOGO_FILE, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    try:
+        import requests
+        _resp = requests.get(RAICESP_LOGO, timeout=8)
+        if _resp.status_code == 200:
+            return _resp.content
+    except Exception:
+        pass
+    return None
+
+@functools.lru_cache(maxsize=4)
+def _logo_jpeg(width_px):
+    # Downsample the logo to the pixel width it is displayed at (JPEG bytes)
+    raw = _logo_bytes()
+    if not raw:
+        return None
+    try:
+        from PIL import Image
+        img = Image.open(io.BytesIO(raw)).convert("RGB")
+        if img.width > width_px:
+            img = img.resize((width_px, max(1, round(img.height * width_px / img.width))), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue()
+    except Exception:
+        return raw
+
+@functools.lru_cache(maxsize=1)
+def _pdf_logo_jpeg():
+    return _logo_jpeg(round(PDF_LOGO_WIDTH_MM / 25.4 * PDF_LOGO_DPI))
+
+@functools.lru_cache(maxsize=1)
+def _write_pdf_logo():
+    data = _pdf_logo_jpeg()
+    if not data:
+        return None
+    import tempfile
+    with tempfile.NamedTemporaryFile(delete=False, prefix="raicesp_logo_", suffix=".jpg") as _tlogo:
+        _tlogo.write(data)
+        return _tlogo.name
+
+def _pdf_logo_path():
+    # FPDF registers images by file name: one stable path => one image object per document.
+    # The temp file is re-created if something (e.g. a /tmp cleaner) removed it.
+    path = _write_pdf_logo()
+    if path and not os.path.exists(path):
+        _write_pdf_logo.cache_clear()
+        path = _write_pdf_logo()
+    return path
+
+# Excel helper (XlsxWriter)
+def _build_excel_report(df_summary, df_questions, project_name, eval_date_str, df_agreement=None):
+    import pandas as pd
+    import numpy as np
+    from io import BytesIO
+
+    summary = df_summary.copy() if df_summary is not None else pd.DataFrame()
+    qdf     = df_questions.copy() if df_questions is not None else pd.DataFrame()
+
+    if "Score" in summary.columns:
+        summary["Score"] = pd.to_numeric(summary["Score"], errors="coerce")
+    if "Domain" in summary.columns:
+        summary["Domain"] = summary["Domain"].astype(str)
+
+    if "Lowest Questions" in summary.columns:
+        summary = summary.drop(columns=["Lowest Questions"])
+
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        # Summary sheet
+        start_row = 2
+        summary.to_excel(writer, index=False, sheet_name="Summary", startrow=start_row)
+        workbook  = writer.book
+        ws        = writer.sheets["Summary"]
+
+        
+        # Row 1: Project and Date
+        merge_format = workbook.add_format({"align": "center", "bold": True})
+        ws.merge_range(0, 0, 0, max(0, len(summary.columns)-1), f"Project: {project_name} | Evaluation Date: {eval_date_str}", merge_format)
+
+        # Column widths
+        for col_idx, col_name in enumerate(summary.columns):
+            width = 50 if col_name.lower().startswith("improvement") else 20
+            ws.set_column(col_idx, col_idx, width)
+
+        # Radar chart (validated)
+        can_chart = (("Domain" in summary.columns) and ("Score" in summary.columns) and (len(summary) > 0) and (summary["Score"].notna().any()))
+        if can_chart:
+            r0 = start_row + 1  # first data row
+            r1 = r0 + len(summary) - 1
+            c_domain = list(summary.columns).index("Domain")
+            c_score  = list(summary.columns).index("Score")
+
+            chart = workbook.add_chart({"type": "radar", "subtype": "filled"})
+            chart.add_series({
+                "name":       "Score",
+                "categories": ["Summary", r0, c_domain, r1, c_domain],
+                "values":     ["Summary", r0, c_score,  r1, c_score],
+                "line":       {"width": 2.0, "color": "#1f4e79"},
+                "fill":       {"color": "#8FAADC", "transparency": 20},
+            })
+            chart.set_style(18)
+            chart.set_title({"name": "Domain Score Radar Chart"})
+            chart.set_legend({"none": True})
+            chart.set_y_axis({"min": 0, "max": 10, "major_unit": 2})
+
+            ws.insert_chart(r1 + 5, 0, chart)
+            ws.write_url(r1 + 42, 0, RAICESP_URL, string="PSPA Tool version 1.2")
+            try:
+                # 0.30 scale of the original 1118 px logo ~ 335 px on the sheet
+                _logo = _logo_jpeg(335)
+                if _logo:
+                    ws.insert_image(r1 + 42, 1, "raicesp_logo.jpg", {"image_data": BytesIO(_logo), "url": RAICESP_URL})
+            except Exception:
+                pass
+        else:
+            warn_fmt = workbook.add_format({"italic": True, "font_color": "#7f7f7f"})
+            ws.write(start_row, 0, "No valid 'Domain'/'Score' data for radar chart.", warn_fmt)
+
+        # Questions sheet
+        if "Question" in qdf.columns and len(qdf) > 0:
+            def _split_q(s):
+                s = str(s or "")
+                parts = s.split(" ", 1)
+                return (parts[0], parts[1]) if len(parts) == 2 else (s, "")
+            qnums, qtexts = zip(*qdf["Question"].apply(_split_q)) if len(qdf) else ([], [])
+            qdf["Question Number"] = qnums
+            qdf["Question Text"]   = qtexts
+        else:
+            qdf["Question Number"] = ""
+            qdf["Question Text"]   = ""
+
+        out = pd.DataFrame({
+            "Domain":          qdf.get("Domain", ""),
+            "Question Number": qdf.get("Question Number", ""),
+            "Question":        qdf.get("Question Text", qdf.get("Question", "")),
+            "Notes":           qdf.get("Notes", ""),
+            "Score":           pd.to_numeric(qdf.get("Score", ""), errors="coerce"),
+        })
+        # Long notes: preview on the Questions sheet, full text on a "Notes" sheet
+        notes_full = out["Notes"].fillna("").astype(str).tolist() if len(out) else []
+        long_rows = [i for i, n in enumerate(notes_full) if is_long_note(n)]
+        if long_rows:
+            out.loc[out.index[long_rows], "Notes"] = [note_preview(notes_full[i]) for i in long_rows]
+        out.to_excel(writer, index=False, sheet_name="Questions")
+        wsq = writer.sheets["Questions"]
+        # Default widths
+        for ci, cname in enumerate(out.columns):
+            wsq.set_column(ci, ci, 18)
+        # Keep "Notes" wide
+        if "Notes" in out.columns:
+            _idx_notes = list(out.columns).index("Notes")
+            wsq.set_column(_idx_notes, _idx_notes, 40)
+        # Auto-fit "Question" based on content length (bounded)
+        if "Question" in out.columns:
+            _idx_q = list(out.columns).index("Question")
+            try:
+                _q_max = int(out["Question"].astype(str).map(len).max() or 0)
+            except Exception:
+                _q_max = 28
+            _q_width = max(28, min(80, _q_max + 5))
+            wsq.set_column(_idx_q, _idx_q, _q_width)
+
+        if long_rows:
+            wrap_fmt = workbook.add_format({"text_wrap": True, "valign": "top"})
+            link_fmt = workbook.add_format({"font_color": "blue", "underline": 1, "text_wrap": True, "valign": "top"})
+            wsn = workbook.add_worksheet("Notes")
+            head_fmt = workbook.add_format({"bold": True})
+            for ci, cname in enumerate(("Question Number", "Part", "Note")):
+                wsn.write(0, ci, cname, head_fmt)
+            wsn.set_column(0, 1, 16)
+            wsn.set_column(2, 2, 120, wrap_fmt)
+            _idx_notes = list(out.columns).index("Notes")
+            r = 1
+            for i in long_rows:
+                wsq.write_url(i + 1, _idx_notes, f"internal:'Notes'!A{r + 1}", link_fmt,
+                              string=out["Notes"].iat[i], tip="Full note on the Notes sheet")
+                for part, chunk in enumerate(_note_chunks(notes_full[i], EXCEL_CELL_CHARS), 1):
+                    wsn.write_string(r, 0, str(out["Question Number"].iat[i]))
+                    wsn.write_number(r, 1, part)
+                    wsn.write_string(r, 2, chunk, wrap_fmt)
+                    r += 1
+
+        # Multi-assessor panels: per-question consensus and agreement, flagged items highlighted
+        if df_agreement is not None and len(df_agreement):
+            df_agreement.to_excel(writer, index=False, sheet_name="Agreement")
+            wsa = writer.sheets["Agreement"]
+            wsa.set_column(0, len(df_agreement.columns) - 1, 12)
+            wsa.set_column(0, 0, 28)
+            wsa.set_column(2, 2, 60)
+            if "Flag" in df_agreement.columns:
+                flag_col = chr(ord("A") + list(df_agreement.columns).index("Flag"))
+                wsa.conditional_format(1, 0, len(df_agreement), len(df_agreement.columns) - 1, {
+                    "type": "formula", "criteria": f"=${flag_col}2=TRUE",
+                    "format": workbook.add_format({"bg_color": "#ffcdd2"}),
+                })
+            wsa.freeze_panes(1, 0)
+
+    buffer.seek(0)
+    return buffer.getvalue()
+
+# PDF helper (FPDF) con header/footer
+class PSPAPDF(FPDF):
+    def __init__(self, project_name, raicesp_url=None):
+        super().__init__()
+        self.project_name = project_name
+        self.raicesp_url = raicesp_url or RAICESP_URL
+        self.set_compression(True)
+
+    def header(self):
+        # RAICESP logo (linked) on top-right; same path on every page => embedded once
+        try:
+            _logo_path = _pdf_logo_path()
+            if _logo_path:
+                x_pos = self.w - self.r_margin - 24
+                self.image(_logo_path, x=x_pos, y=8, w=PDF_LOGO_WIDTH_MM, link=self.raicesp_url)
+        except Exception:
+            pass
+        self.set_font("Arial", "B", 11)
+        self.set_text_color(0)
+        self.cell(0, 8, _latin1("PATIENT SAFETY PROJECT ADEQUACY DASHBOARD"), ln=True, align="L")
+        self.set_font("Arial", "", 9)
+        self.set_text_color(80)
+        self.cell(0, 8, _latin1(f"Project: {self.project_name}"), ln=True, align="L")
+        self.cell(0, 6, _latin1(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}"), ln=True, align="L")
+        self.ln(2)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.set_text_color(100)
+        self.cell(0, 10, _latin1(f"PSPA Tool version 1.2 | Page {self.page_no()} of {{nb}} | bit.ly/raicesp"), 0, 0, "C", link=self.raicesp_url)
+
+def _latin1(s: str) -> str:
+    try:
+        return (s or "").encode('latin-1', 'replace').decode('latin-1')
+    except Exception:
+        return str(s)
+
+
+
+# Long notes: shown as a preview in the UI and the question listings, with the
+# full text flowed once into the PDF Notes Appendix / the Excel "Notes" sheet.
+# The threshold is meant for pasted audit excerpts, not ordinary typed notes
+LONG_NOTE_CHARS = 8000
+NOTE_PREVIEW_CHARS = 300
+EXCEL_CELL_CHARS = 32000  # Excel caps a cell at 32767 characters
+
+def is_long_note(text):
+    return len(text or "") > LONG_NOTE_CHARS
+
+def note_preview(text, limit=NOTE_PREVIEW_CHARS):
+    """First `limit` characters of a note on one line, cut at a word boundary."""
+    head = " ".join(str(text or "")[:limit + 1].split())
+    if len(head) <= limit:
+        return head
+    return (head[:limit].rsplit(" ", 1)[0] or head[:limit]) + " ..."
+
+def _note_chunks(text, size):
+    # Paragraph-aligned pieces of at most `size` characters (hard split if a paragraph is longer)
+    chunk = ""
+    for para in str(text or "").split("\n"):
+        while len(para) > size:
+            if chunk:
+                yield chunk
+                chunk = ""
+            yield para[:size]
+            para = para[size:]
+        if chunk and len(chunk) + 1 + len(para) > size:
+            yield chunk
+            chunk = para
+        else:
+            chunk = f"{chunk}\n{para}" if chunk else para
+    if chunk:
+        yield chunk
+
+def _effective_width(pdf):
+    return pdf.w - pdf.l_margin - pdf.r_margin
+
+def _lines_for_text(pdf, text, size=11, style=""):
+    # Approximate number of lines for given text at current width
+    try:
+        s = _latin1(text or "")
+    except Exception:
+        s = str(text or "")
+    max_w = _effective_width(pdf)
+    pdf.set_font("Arial", style, size)
+    total_lines = 0
+    for para in s.split("\n"):
+        if para == "":
+            total_lines += 1
+            continue
+        words = para.split(" ")
+        line_w = 0.0
+        lines_here = 1
+        for w in words:
+            ww = pdf.get_string_width(w + " ")
+            if line_w + ww <= max_w:
+                line_w += ww
+            else:
+                lines_here += 1
+                line_w = ww
+        total_lines += max(1, lines_here)
+    return total_lines
+
+def _estimate_domain_block_height(pdf, q_rows):
+    # Domain title
+    h = 8
+    # Questions + optional notes
+    for row in q_rows:
+        qtxt = f"- {row.get('Question','')} : {row.get('Score','')}/10"
+        h += _lines_for_text(pdf, qtxt, size=11, style="") * 6
+        notes = row.get("Notes","")
+        if notes:
+            h += _lines_for_text(pdf, f"Notes: {notes}", size=10, style="I") * 6
+        h += 1
+    # small bottom margin
+    return h + 6
+
+
+def _pdf_ensure_space(pdf, needed_h=30):
+    # If not enough vertical space, start a new page before printing the block
+    remaining = pdf.h - pdf.b_margin - pdf.get_y()
+    if remaining < needed_h:
+        pdf.add_page()
+
+def _estimate_block_height(q_count):
+    # approx: domain title (8) + each question line (6) + notes line (6) + small gaps
+    return 10 + q_count * 14 + 6
+
+
+def pdf_add_safe_multicell(pdf, text, w=0, h=6, txt_color=(0,0,0), italic=False):
+    pdf.set_text_color(*txt_color)
+    style = "" if not italic else "I"
+    pdf.set_font("Arial", style, 10 if italic else 11)
+    pdf.multi_cell(w, h, _latin1(text))
+
+def _ranking_rgb(ranking):
+    return RANKING_RGB[ranking]
+
+def _pdf_summary_section(pdf, domain_scores, lowest_questions):
+    # Summary
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 10, _latin1("Domain Scores"), ln=True)
+    pdf.set_font("Arial", "", 11)
+    for d, s in domain_scores.items():
+        ranking = get_ranking(s)
+        pdf.set_fill_color(*_ranking_rgb(ranking))
+        pdf.set_text_color(0,0,0)
+        pdf.cell(0, 8, _latin1(f"{d} - {s:.1f}/10 ({ranking.upper()})"), ln=True, fill=True)
+
+    # Lowest questions
+    pdf.ln(4)
+    _pdf_ensure_space(pdf, 24)
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 8, _latin1("Lowest Rated Questions"), ln=True)
+    pdf.set_font("Arial", "", 11)
+    for d, q in lowest_questions.items():
+        _pdf_ensure_space(pdf, 12)
+        pdf_add_safe_multicell(pdf, _latin1(f"{d}: {q}"), w=0, h=6, txt_color=(200,0,0), italic=False)
+
+def _pdf_iap_section(pdf, domain_scores, iap):
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 8, _latin1("Improvement Action Plan"), ln=True)
+
+    for d in domain_scores.keys():
+        plan = iap.get(d, {})
+        pdf.set_font("Arial", "B", 11)
+        pdf.set_text_color(0,0,0)
+        pdf.cell(0, 7, _latin1(d), ln=True)
+        pdf.set_font("Arial", "I", 10)
+        pdf_add_safe_multicell(pdf, _latin1(f"• Action: {plan.get('action','')}"), txt_color=(0,0,160), italic=True)
+        pdf_add_safe_multicell(pdf, _latin1(f"• Responsible: {plan.get('responsible','')}"), txt_color=(0,0,160), italic=True)
+        pdf_add_safe_multicell(pdf, _latin1(f"• Review Date: {plan.get('review_date', date.today())}"), txt_color=(0,0,160), italic=True)
+        pdf.ln(1)
+
+def _pdf_details_section(pdf, domain_scores, questions_data, long_notes=None):
+    # With a `long_notes` list, long notes are printed as a linked preview and
+    # appended to it as (label, text, link) for _pdf_notes_appendix()
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 8, _latin1("Domain Details"), ln=True)
+    for d in domain_scores.keys():
+        q_rows = [r for r in questions_data if r.get("Domain")==d]
+        _pdf_ensure_space(pdf, _estimate_domain_block_height(pdf, q_rows) if ' _estimate_domain_block_height' in globals() else 30)
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 7, _latin1(d), ln=True)
+        pdf.set_font("Arial", "", 11)
+        for row in q_rows:
+            qtxt = f"- {row.get('Question','')} : {row.get('Score','')}/10"
+            pdf_add_safe_multicell(pdf, _latin1(qtxt), w=0, h=6, txt_color=(0,0,0), italic=False)
+            n = row.get("Notes","")
+            if n and long_notes is not None and is_long_note(n):
+                link = pdf.add_link()
+                long_notes.append((str(row.get("Question", "")).split(" ", 1)[0], n, link))
+                pdf_add_safe_multicell(pdf, _latin1(f"Notes: {note_preview(n)}"), w=0, h=6, txt_color=(0,0,160), italic=True)
+                pdf.set_font("Arial", "U", 9)
+                pdf.set_text_color(0, 0, 200)
+                pdf.cell(0, 5, _latin1(f"Full note N{len(long_notes)} ({len(n):,} characters) in the Notes Appendix"), ln=True, link=link)
+            elif n:
+                pdf_add_safe_multicell(pdf, _latin1(f"Notes: {n}"), w=0, h=6, txt_color=(0,0,160), italic=True)
+        pdf.ln(1)
+
+def _pdf_notes_appendix(pdf, long_notes):
+    # Full text of the long notes, one multi_cell per paragraph chunk so the
+    # layout work stays linear in the note length
+    if not long_notes:
+        return
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 8, _latin1("Notes Appendix"), ln=True)
+    for i, (label, text, link) in enumerate(long_notes, 1):
+        _pdf_ensure_space(pdf, 20)
+        pdf.set_link(link, y=pdf.get_y(), page=pdf.page_no())
+        pdf.set_font("Arial", "B", 11)
+        pdf.set_text_color(0,0,0)
+        pdf.cell(0, 7, _latin1(f"N{i} - Question {label}"), ln=True)
+        for chunk in _note_chunks(text, 4000):
+            pdf_add_safe_multicell(pdf, chunk, w=0, h=5, txt_color=(0,0,0), italic=True)
+        pdf.ln(2)
+
+def _pdf_disagreement_section(pdf, disagreements):
+    # Multi-assessor panels: items the assessors disagree on most (pspa_consensus.flagged())
+    pdf.ln(4)
+    _pdf_ensure_space(pdf, 24)
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0,0,0)
+    pdf.cell(0, 10, _latin1("Items with the Most Assessor Disagreement"), ln=True)
+    if not len(disagreements):
+        pdf_add_safe_multicell(pdf, "No item below the agreement threshold.", italic=True)
+        return
+    for _, row in disagreements.iterrows():
+        pdf_add_safe_multicell(pdf, f"- {row['Question Number']} {row['Question']}", txt_color=(0,0,0))
+        pdf_add_safe_multicell(pdf, f"median {row['Median']:g}, SD {row['SD']:.2f}, range {row['Min']:g}-{row['Max']:g}, "
+                                    f"rWG {row['rWG']:.2f} ({row['Assessors']} assessors)", txt_color=(160,0,0), italic=True)
+
+def _build_pdf_report(project_name, domain_scores, lowest_questions, questions_data, iap=None, disagreements=None):
+    # Build PDF and return bytes; IAP fields default to the current session
+    if iap is None:
+        iap = _session_iap(domain_scores.keys())
+    pdf = PSPAPDF(project_name or "Project", raicesp_url=RAICESP_URL)
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    _pdf_summary_section(pdf, domain_scores, lowest_questions)
+    if disagreements is not None:
+        _pdf_disagreement_section(pdf, disagreements)
+
+    # Improvement Action Plan (new page)
+    pdf.add_page()
+    _pdf_iap_section(pdf, domain_scores, iap)
+
+    # Domain Details (new page)
+    pdf.add_page()
+    long_notes = []
+    _pdf_details_section(pdf, domain_scores, questions_data, long_notes=long_notes)
+    _pdf_notes_appendix(pdf, long_notes)
+
+    # In-memory output (FPDF 1.7 returns a latin-1 string)
+    return pdf.output(dest="S").encode("latin-1")
@@ -0,0 +1,124 @@
+# Static dashboard resources, built once per process and shared read-only by
+# every Streamlit session through st.cache_resource: the stylesheet (one
+# minified block with classes instead of per-element inline styles and
+# per-domain <style> blocks), the instruction texts, the header/footer logo
+# markup, the compiled question banks and the downsampled report logo.
+import re
+from types import MappingProxyType
+import streamlit as st
+from pspa_reports import (
+    RAICESP_URL, RAICESP_LOGO, list_question_banks, load_question_bank, _pdf_logo_path,
+)
+
+_CSS = """
+/* Domain header, question line and IAP chip */
+.pspa-domain {
+  background-color: #003366;
+  color: white;
+  padding: 8px;
+  border-radius: 6px;
+  margin-bottom: 14px;
+}
+.pspa-gap { height: 8px; }
+.pspa-q { font-size: 1.08em; }
+.pspa-qn { color: #1a75ff; font-weight: bold; }
+.pspa-iap-chip {
+  display: inline-block;
+  background: #0b3d2e;
+  color: #fff;
+  padding: 3px 10px;
+  border-radius: 9px;
+  font-weight: 800;
+  letter-spacing: .4px;
+  margin: 4px 0;
+}
+/* The three IAP widgets of a domain look like a single boxed group */
+textarea[aria-label^='Improvement Action Plan for '],
+input[aria-label^='IAP responsible for '],
+input[aria-label='IAP Review Date'] {
+  background-color: #145a43 !important;
+  color: #ffffff !important;
+  border: 3px solid #0b3d2e !important;
+  box-shadow: 0 1px 2px rgba(0,0,0,0.25);
+}
+/* Merge borders to emulate a single outer box */
+textarea[aria-label^='Improvement Action Plan for '] {
+  border-bottom-width: 1px !important;
+  border-top-left-radius: 12px !important;
+  border-top-right-radius: 12px !important;
+}
+input[aria-label^='IAP responsible for '] {
+  border-top-width: 1px !important;
+  border-bottom-width: 1px !important;
+  border-radius: 0 !important;
+}
+input[aria-label='IAP Review Date'] {
+  border-top-width: 1px !important;
+  border-bottom-left-radius: 12px !important;
+  border-bottom-right-radius: 12px !important;
+}
+"""
+
+INTRO_MD = """
+Welcome to the **PSPA Tool** (Version 1.2).
+
+This tool provides a rigorous, end‑to‑end workflow to evaluate the adequacy of patient safety projects:
+- **Assess** each project dimension with structured items and 0–10 scoring.
+- **Identify** the lowest‑rated items and the **Improvement Action Plan (IAP)** per domain.
+- **Plan & track** responsibilities and review dates, and **re‑evaluate** later to close the loop.
+
+You can export your current responses (JSON), and download professional **Excel** and **PDF** reports at any time.
+The interface highlights scores, supports rich notes, and keeps pagination readable in the final PDF.
+"""
+
+SCALE_MD = """
+Use the common **0-10 scale** across **all 7 PSPA dimensions**. Score each question based on evidence available today.
+Document brief **notes** (what you saw, where it lives) and add the **Improvement Action Plan (IAP)** for each domain.
+
+**Common scale (0-10)**
+
+| Level | Descriptor | Minimum expected criteria / evidence |
+|:-----:|:-----------|:-------------------------------------|
+| **0** | **Nonexistent** | No activity or documents. Nothing planned or assigned. |
+| **2** | **Declared intent** | Verbal intent or unapproved drafts. No formally designated owners. No secured resources or timeline. |
+| **4** | **Basic defined** | Basic elements documented but incomplete: a named owner, initial document(s), preliminary timeline, no evidence of regular use or data. |
+| **6** | **Initial implementation** | Approved documents in use; active roles; first actions underway; baseline or early process data available; limited coverage (<50%) and no systematic improvement cycles yet. |
+| **8** | **Operational and consistent** | Extended practice (~50-80% coverage), periodic data with feedback; PDSA-type adjustments; risks managed; evidence of sustained compliance for >=2-3 months. |
+| **10** | **Integrated and outcome-producing** | Practice standardized with >80-90% coverage; demonstrated improvements in outcomes; embedded in SOPs/guidelines and budgets; audit and continuous improvement; independent of the initial project team; learning disseminated. |
+"""
+
+EVIDENCE_MD = """
+- **Leadership & Governance**: active sponsor and committee; **RACI** and meeting **minutes**; approved **policy/charter**; **quarterly** review routine.
+- **Resources & Capabilities**: budget / funding source; staffing and **competencies**; **training plan**; materials / **protocols at point of care**.
+- **Baseline**: indicators with **operational definitions**; target population; initial data (**run chart** / table); **SMART** goals.
+- **Design & Implementation**: **theory of change**; SOPs / standards; **timeline with milestones**; documented **coverage / reach**; traceability of changes.
+- **Change Management**: **communication plan**; champions; **training sessions**; audits / observations; **feedback loops** to teams.
+- **Sustainability**: integration into **SOPs / roles**; **KPIs** on the institutional dashboard; **handover / rotation** plan; **recurrent funding** line.
+- **Cross-learning & Partnerships**: **MoUs / agreements**; inter-facility **learning sessions**; **shared data / lessons learned**; co-mentoring & dissemination products.
+"""
+
+
+def _minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,])\s*", r"\1", css).replace(";}", "}").strip()
+
+@st.cache_resource(show_spinner=False)
+def static_resources():
+    """Read-only registry of static markup, texts and report assets (one per process)."""
+    banks = tuple(list_question_banks())
+    for name in banks:
+        load_question_bank(name)  # compile every bank up front
+    _pdf_logo_path()  # fetch + downsample the report logo once
+    return MappingProxyType({
+        "css": f"<style>{_minify_css(_CSS)}</style>",
+        "header_logo": f"<a href='{RAICESP_URL}' target='_blank'><img src='{RAICESP_LOGO}' width='150'/></a>",
+        "footer_logo": f"<a href='{RAICESP_URL}' target='_blank'><img src='{RAICESP_LOGO}' width='110' style='margin-top:6px;'/></a>",
+        "intro_md": INTRO_MD,
+        "scale_md": SCALE_MD,
+        "evidence_md": EVIDENCE_MD,
+        "domain_header": "<h3 class='pspa-domain'>{}</h3><div class='pspa-gap'></div>",
+        "question": "<p class='pspa-q'><span class='pspa-qn'>{}</span> <strong>{}</strong></p>",
+        "iap_chip": "<div class='pspa-iap-chip'>IAP</div>",
+        "question_banks": banks,
+    })
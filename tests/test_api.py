@@ -0,0 +1,73 @@
+# Request validation of the local API (pspa_api.py): malformed headers and
+# out-of-schema evaluations get a 4xx before any work is queued.
+import os
+import sys
+import json
+import socket
+import threading
+import http.client
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_api import make_server
+from pspa_loadtest import sample_evaluation
+
+
+@pytest.fixture(scope="module")
+def port():
+    server = make_server(port=0, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    server.service.shutdown()
+
+def _post(port, body, path="/score"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("POST", path, body.encode("utf-8") if isinstance(body, str) else body)
+    resp = conn.getresponse()
+    return resp.status, resp.read()
+
+def _raw_status(port, headers):
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as s:
+        s.sendall(b"POST /score HTTP/1.1\r\nHost: test\r\n" + b"".join(h + b"\r\n" for h in headers) + b"\r\n")
+        return int(s.recv(4096).split(b" ", 2)[1])
+
+
+@pytest.mark.parametrize("headers, status", [
+    ([], 411),
+    ([b"Content-Length: abc"], 400),
+    ([b"Content-Length: -1"], 400),
+    ([b"Content-Length: 99999999"], 413),
+])
+def test_content_length(port, headers, status):
+    assert _raw_status(port, headers) == status
+
+@pytest.mark.parametrize("body", [
+    '[]',
+    '{"scores": "x"}',
+    '{"notes": {"note_1.1": 3}}',
+    '{"project_name": 5}',
+    '{"scores": {"slider_1.1": 1000}}',
+    '{"scores": {"slider_1.1": -1}}',
+    '{"scores": {"slider_1.1": true}}',
+    '{"scores": {"slider_1.1": NaN}}',
+    '{"scores": {"slider_1.1": Infinity}}',
+    '{"question_bank": "../../etc/passwd"}',
+])
+@pytest.mark.parametrize("path", ["/score", "/report/pdf"])
+def test_invalid_evaluation_rejected(port, body, path):
+    status, payload = _post(port, body, path)
+    assert status == 400
+    assert "error" in json.loads(payload)
+
+def test_score_echoes_bank_used(port):
+    status, payload = _post(port, '{"scores": {"slider_1.1": 7.5}}')
+    assert status == 200
+    assert json.loads(payload)["question_bank"] == "pspa_v1.2"
+    status, payload = _post(port, json.dumps(sample_evaluation(1)))
+    assert status == 200
+    assert 0 <= json.loads(payload)["overall_score"] <= 10
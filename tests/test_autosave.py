@@ -0,0 +1,111 @@
+# Autosave journal (pspa_autosave.py): what is written and replayed after a
+# crash, compaction, and the background writer's eviction and error handling.
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pspa_autosave
+from pspa_autosave import AutosaveJournal, _Writer, autosave, get_journal, snapshot_state
+
+
+def _journal(tmp_path, **kwargs):
+    return AutosaveJournal(str(tmp_path / "sid.jsonl"), **kwargs)
+
+def _write(journal, state):
+    journal.stage(snapshot_state(state))
+    return journal.flush()
+
+
+def test_parked_bank_answers_roundtrip(tmp_path):
+    j = _journal(tmp_path)
+    parked = {"pspa_v1.2": {"slider_1.1": 2, "note_1.1": "kept", "date-1. LEADERSHIP": date(2026, 1, 31)}}
+    _write(j, {"question_bank": "pspa_checklist_v2025.07.17", "slider_1.1": 9, "_bank_answers": parked})
+    assert _journal(tmp_path).load() == {"question_bank": "pspa_checklist_v2025.07.17", "slider_1.1": 9,
+                                         "_bank_answers": parked}
+
+def test_torn_last_line_is_ignored_and_repaired(tmp_path):
+    j = _journal(tmp_path)
+    _write(j, {"slider_1.1": 2, "note_1.1": "first"})
+    with open(j.path, "a", encoding="utf-8") as f:
+        f.write('{"t":1,"set":{"slider_1.1":')  # crash mid-write
+    assert _journal(tmp_path).load() == {"slider_1.1": 2, "note_1.1": "first"}
+    j = _journal(tmp_path)
+    _write(j, {"slider_1.1": 7, "note_1.1": "first"})
+    with open(j.path, encoding="utf-8") as f:
+        assert f.read().count("\n") == 3  # the torn line was terminated, not appended to
+    assert _journal(tmp_path).load() == {"slider_1.1": 7, "note_1.1": "first"}
+
+def test_removed_keys_are_journaled_as_del(tmp_path):
+    j = _journal(tmp_path)
+    _write(j, {"slider_1.1": 2, "note_1.1": "gone soon"})
+    _write(j, {"slider_1.1": 2})
+    with open(j.path, encoding="utf-8") as f:
+        last = json.loads(f.readlines()[-1])
+    assert last["del"] == ["note_1.1"] and last["set"] == {}
+    assert _journal(tmp_path).load() == {"slider_1.1": 2}
+
+def test_unchanged_snapshot_writes_nothing(tmp_path):
+    j = _journal(tmp_path)
+    assert _write(j, {"slider_1.1": 2})
+    assert not _write(j, {"slider_1.1": 2})
+
+def test_compaction_keeps_state(tmp_path):
+    j = _journal(tmp_path, compact_every=3)
+    for i in range(7):
+        _write(j, {"slider_1.1": i, f"note_1.{i}": "x", "date-1. A": date(2026, 1, 1 + i)})
+    with open(j.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) < 3 and "full" in lines[0]
+    assert not os.path.exists(j.path + ".tmp")
+    assert _journal(tmp_path).load() == {"slider_1.1": 6, "note_1.6": "x", "date-1. A": date(2026, 1, 7)}
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    w = _Writer(0.0, str(tmp_path))  # not started: the test drives it
+    monkeypatch.setattr(pspa_autosave, "_writer", w)
+    monkeypatch.setattr(pspa_autosave, "AUTOSAVE_DIR", str(tmp_path))
+    return w
+
+def test_idle_eviction_keeps_pending_journals(writer):
+    autosave("s1", {"slider_1.1": 3})
+    writer.evict_idle(time.monotonic() + 10 ** 6, idle=0)
+    assert len(writer.journals) == 1  # staged but not written yet
+    writer.flush_due(time.monotonic(), force=True)
+    writer.evict_idle(time.monotonic() + 10 ** 6, idle=0)
+    assert not writer.journals
+    assert get_journal("s1").load() == {"slider_1.1": 3}
+
+def test_eviction_racing_stage_loses_nothing(writer):
+    done = threading.Event()
+
+    def stage():
+        for i in range(2000):
+            autosave("s1", {"slider_1.1": i})
+        done.set()
+
+    t = threading.Thread(target=stage)
+    t.start()
+    while not done.is_set():
+        writer.flush_due(time.monotonic(), force=True)
+        writer.evict_idle(time.monotonic(), idle=0)
+    t.join()
+    writer.flush_due(time.monotonic(), force=True)
+    assert get_journal("s1").load() == {"slider_1.1": 1999}
+
+def test_failing_journal_does_not_stop_the_writer(writer, caplog):
+    autosave("bad", {"note_1.1": object()})  # not JSON-serializable
+    autosave("good", {"note_1.1": "saved"})
+    with caplog.at_level(logging.ERROR, logger="pspa_autosave"):
+        writer.flush_due(time.monotonic(), force=True)
+    assert "Autosave flush failed" in caplog.text
+    assert get_journal("good").load() == {"note_1.1": "saved"}
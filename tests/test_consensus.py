@@ -0,0 +1,88 @@
+# Multi-assessor statistics (pspa_consensus.py): Krippendorff's alpha against
+# the published example and a pairwise brute force, rWG flagging, and the
+# bank/project checks of load_panel.
+import os
+import sys
+import json
+import itertools
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_golden import FIXTURE_DIR
+from pspa_consensus import AGREEMENT_THRESHOLD, krippendorff_alpha, load_panel
+
+NA = np.nan
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def _alpha_pairwise(scores):
+    # Textbook definition: every ordered pair of values within a unit (observed)
+    # and across all pairable values (expected), interval metric
+    S = np.asarray(scores, dtype=float)
+    units = [col[~np.isnan(col)] for col in S.T]
+    units = [u for u in units if len(u) >= 2]
+    values = np.concatenate(units)
+    n = len(values)
+    d_obs = sum((a - b) ** 2 / (len(u) - 1) for u in units for a, b in itertools.permutations(u, 2)) / n
+    d_exp = sum((a - b) ** 2 for a, b in itertools.permutations(values, 2)) / (n * (n - 1))
+    return 1 - d_obs / d_exp
+
+
+def test_alpha_published_example():
+    # Krippendorff (2011), "Computing Krippendorff's alpha-reliability": 4 observers, 12 units
+    scores = [[1, 2, 3, 3, 2, 1, 4, 1, 2, NA, NA, NA],
+              [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, NA, 3],
+              [NA, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, NA],
+              [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, NA]]
+    assert round(krippendorff_alpha(scores), 3) == 0.849
+
+@pytest.mark.parametrize("seed", range(5))
+def test_alpha_matches_pairwise(seed):
+    rnd = np.random.default_rng(seed)
+    S = rnd.integers(0, 11, size=(5, 20)).astype(float)
+    S[rnd.random(S.shape) < 0.2] = NA
+    assert krippendorff_alpha(S) == pytest.approx(_alpha_pairwise(S))
+
+def test_alpha_edge_cases():
+    assert krippendorff_alpha([[3, 3, 3], [3, 3, 3]]) == 1.0
+    assert np.isnan(krippendorff_alpha([[1, NA], [NA, 2]]))
+
+
+def _evaluation(assessor, scores, **extra):
+    return dict({"assessor": assessor, "project_name": "P", "question_bank": "pspa_v1.2",
+                 "scores": {f"slider_{q}": v for q, v in scores.items()}}, **extra)
+
+def test_rwg_and_flagging():
+    panel = load_panel([_evaluation("A", {"1.1": 4, "1.2": 0, "1.3": 7}),
+                        _evaluation("B", {"1.1": 6, "1.2": 10})])
+    stats = panel.item_stats().set_index("Question Number")
+    # uniform variance over 11 points is 10: var 2 -> 0.8, var 50 -> clipped to 0
+    assert stats.loc["1.1", "rWG"] == 0.8
+    assert stats.loc["1.2", "rWG"] == 0.0
+    assert np.isnan(stats.loc["1.3", "rWG"]) and stats.loc["1.3", "Assessors"] == 1
+    flagged = panel.flagged()
+    assert list(flagged["Question Number"]) == ["1.2"]
+    assert (flagged["rWG"] < AGREEMENT_THRESHOLD).all()
+    data = panel.consensus_evaluation("median")
+    assert data["scores"]["slider_1.1"] == 5.0 and data["scores"]["slider_1.3"] == 7.0
+    assert "slider_1.4" not in data["scores"]
+
+def test_panel_rejects_other_bank():
+    with pytest.raises(ValueError, match="question bank"):
+        load_panel([_fixture("basic"), _fixture("checklist_bank")])
+
+def test_panel_rejects_other_project():
+    with pytest.raises(ValueError, match="project"):
+        load_panel([_evaluation("A", {"1.1": 4}), _evaluation("B", {"1.1": 6}, project_name="Other")])
+
+def test_panel_fixture_loads():
+    panel = load_panel(_fixture("panel_12"))
+    assert len(panel) == 12
+    assert -1.0 <= panel.alpha() <= 1.0
@@ -0,0 +1,84 @@
+# Dashboard behaviour driven headlessly with AppTest (autosave off).
+import os
+import sys
+import json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pspa_autosave
+from pspa_reports import LONG_NOTE_CHARS
+from streamlit.testing.v1 import AppTest
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("PSPA_AUTOSAVE", "0")
+    monkeypatch.setattr(pspa_autosave, "AUTOSAVE_ENABLED", False)
+    at = AppTest.from_file(os.path.join(ROOT, "pspa_dashboard.py"), default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+def _note_keys(at):
+    return [t.key for t in at.text_area if t.key and t.key.startswith("note_")]
+
+
+def test_typed_long_note_keeps_editor_open(app):
+    app.text_area(key="note_1.1").input("x" * 2000).run()
+    assert "note_1.1" in _note_keys(app) and not len(app.toggle)
+    app.text_area(key="note_1.1").input("audit excerpt " * (LONG_NOTE_CHARS // 10)).run()
+    assert not app.exception
+    assert "note_1.1" in _note_keys(app)
+    assert app.toggle(key="edit_note_1.1").value
+    app.run()
+    assert "note_1.1" in _note_keys(app)
+
+def test_loaded_long_note_starts_collapsed(app):
+    app.session_state["note_1.2"] = "audit excerpt " * (LONG_NOTE_CHARS // 10)
+    app.run()
+    assert "note_1.2" not in _note_keys(app)
+    assert not app.toggle(key="edit_note_1.2").value
+    app.toggle(key="edit_note_1.2").set_value(True).run()
+    assert len(app.text_area(key="note_1.2").value) == len(app.session_state["note_1.2"])
+
+
+CHECKLIST_BANK = "pspa_checklist_v2025.07.17"
+
+def _upload(at, data):
+    at.file_uploader(key="uploader_json").set_value(("evaluation.json", json.dumps(data).encode("utf-8"), "application/json"))
+    at.run()
+    assert not at.exception
+
+def _evaluation(**fields):
+    data = {"project_name": "Ward 5", "project_objectives": "", "question_bank": "pspa_v1.2",
+            "scores": {"slider_1.1": 7, "slider_2.1": 9}, "notes": {"note_1.1": "imported"},
+            "improvements": {}, "responsible": {}, "review_date": {}}
+    data.update(fields)
+    return data
+
+def test_reimport_writes_only_changes(app):
+    data = _evaluation()
+    _upload(app, data)
+    assert app.slider(key="slider_1.1").value == 7 and app.session_state["slider_2.1"] == 9
+    assert app.success[0].value.startswith("Previous responses loaded: 4 field(s) updated, 0 cleared")
+    _upload(app, data)
+    assert not len(app.success)
+    assert "nothing to apply" in app.info[0].value
+    data["notes"]["note_1.1"] = "edited"
+    _upload(app, data)
+    assert app.success[0].value.startswith("Previous responses loaded: 1 field(s) updated, 0 cleared")
+    assert app.text_area(key="note_1.1").value == "edited"
+
+def test_import_from_other_bank_parks_answers(app):
+    app.slider(key="slider_1.1").set_value(2).run()
+    app.text_area(key="note_1.2").input("v1.2 note").run()
+    _upload(app, _evaluation(question_bank=CHECKLIST_BANK))
+    assert app.session_state["question_bank"] == CHECKLIST_BANK
+    assert ", 0 cleared" in app.success[0].value
+    assert app.slider(key="slider_1.1").value == 7
+    app.selectbox(key="question_bank").set_value("pspa_v1.2").run()
+    assert app.slider(key="slider_1.1").value == 2
+    assert app.text_area(key="note_1.2").value == "v1.2 note"
@@ -0,0 +1,18 @@
+# Golden-output regression check: every fixture's PDF/Excel content must match
+# its committed snapshot (accept intended changes with
+# `python pspa_golden.py <fixture> --update`).
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_golden import list_fixtures, run_fixture
+
+
+@pytest.mark.parametrize("name", list_fixtures())
+def test_fixture_matches_snapshot(name):
+    result = run_fixture(name, repeat=1)
+    assert result["status"] == "ok", f"{name}: {result['status']}\n" + "\n".join(result["diffs"][:50])
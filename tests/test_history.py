@@ -0,0 +1,56 @@
+# Evaluation history dataset (pspa_history.py): round trip, per-format files,
+# compaction during export and the read-time budget of the append workflow.
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pspa_history
+from pspa_history import benchmark, export_evaluations, read_history
+from pspa_loadtest import sample_evaluation
+from pspa_reports import load_question_bank, score_evaluation
+
+READ_SECONDS_BUDGET = 1.0  # two-column read; ~1M rows over 200 projects reads in ~0.1 s
+
+
+def _evaluation(i, project="P"):
+    return dict(sample_evaluation(i), project_name=project, country="PT", evaluation_date="2025-03-01")
+
+def _files(root, table="questions"):
+    return sorted(os.path.join(d, f) for d, _, fs in os.walk(os.path.join(root, table)) for f in fs)
+
+
+def test_domain_scores_read_back_exactly(tmp_path):
+    data = _evaluation(1)
+    export_evaluations([data], str(tmp_path))
+    domain_scores = score_evaluation(data)[0]
+    table = read_history(str(tmp_path), "domains", columns=["domain", "score"]).to_pylist()
+    assert {r["domain"]: r["score"] for r in table} == domain_scores
+
+def test_export_compacts_touched_partitions(tmp_path):
+    root = str(tmp_path)
+    for i in range(5):
+        export_evaluations([_evaluation(i), _evaluation(100 + i, project="Q")], root)
+    assert len(_files(root)) == 2  # one file per project partition
+    assert read_history(root, where={"project": "P"}).num_rows == 5 * len(load_question_bank())
+    assert len(read_history(root, columns=["evaluation_id"]).column("evaluation_id").unique()) == 10
+
+def test_formats_share_a_root(tmp_path):
+    root = str(tmp_path)
+    export_evaluations([_evaluation(1)], root, fmt="parquet")
+    export_evaluations([_evaluation(2)], root, fmt="arrow")
+    export_evaluations([_evaluation(3)], root, fmt="parquet")
+    parquet = read_history(root, columns=["evaluation_id"])
+    arrow = read_history(root, columns=["evaluation_id"], fmt="arrow")
+    assert len(parquet.column("evaluation_id").unique()) == 2
+    assert len(arrow.column("evaluation_id").unique()) == 1
+
+@pytest.mark.parametrize("fmt", sorted(pspa_history.FORMATS))
+def test_append_workflow_read_budget(tmp_path, fmt):
+    stats = benchmark(str(tmp_path), evaluations=3000, projects=50, batches=6, fmt=fmt)
+    assert stats["files"] == 50
+    assert stats["read_rows"] == stats["rows"]
+    assert stats["read_s"] <= READ_SECONDS_BUDGET, stats
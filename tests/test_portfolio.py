@@ -0,0 +1,53 @@
+# Streaming portfolio PDF (pspa_portfolio.py): the output parses strictly and
+# peak memory stays flat as the number of projects grows.
+import io
+import os
+import sys
+import tracemalloc
+
+import pypdf
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_portfolio import _StreamingPDF, build_portfolio_pdf
+from pspa_loadtest import sample_evaluation
+
+PROJECTS = 25
+MEMORY_GROWTH_BUDGET = 1.5  # peak at 4x the projects vs. 1x (measured ~1.2)
+
+
+def _evaluations(n):
+    return (sample_evaluation(i) for i in range(n))
+
+def _peak_bytes(n, path):
+    tracemalloc.start()
+    try:
+        build_portfolio_pdf(_evaluations(n), path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_output_parses_strictly():
+    out = io.BytesIO()
+    assert build_portfolio_pdf(_evaluations(PROJECTS), out) == PROJECTS
+    reader = pypdf.PdfReader(io.BytesIO(out.getvalue()), strict=True)
+    assert len(reader.pages) >= 2 * PROJECTS + 1
+    assert "Portfolio Overview" in reader.pages[-1].extract_text()
+    assert out.getvalue().count(b"/Type /Page\n") == len(reader.pages)
+
+def test_peak_memory_flat_in_project_count(tmp_path):
+    build_portfolio_pdf(_evaluations(2), io.BytesIO())  # warm fonts, logo and layout caches
+    small = _peak_bytes(PROJECTS, str(tmp_path / "small.pdf"))
+    large = _peak_bytes(4 * PROJECTS, str(tmp_path / "large.pdf"))
+    assert large <= MEMORY_GROWTH_BUDGET * small, f"{large} vs {small} bytes peak"
+
+def test_internal_links_rejected():
+    pdf = _StreamingPDF(io.BytesIO())
+    pdf.add_page()
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(0, 10, "Full note", link=pdf.add_link())
+    with pytest.raises(ValueError, match="Internal links"):
+        pdf.add_page()
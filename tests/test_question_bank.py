@@ -0,0 +1,52 @@
+# Question-bank compilation (pspa_reports.compile_question_bank / QuestionBank).
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_reports import compile_question_bank, list_question_banks, load_question_bank, DEFAULT_QUESTION_BANK
+
+SPEC = {
+    "id": "test", "version": "1.0", "title": "Test bank",
+    "domains": [
+        {"name": "1. ALPHA", "questions": ["A one?", "A two?"]},
+        {"name": "2. BETA", "questions": ["B one?", {"id": "2.x", "text": "B custom?"}, "B three?"]},
+    ],
+}
+
+
+def test_default_ids_and_key():
+    bank = compile_question_bank(SPEC)
+    assert bank.key == "test_v1.0" and bank.title == "Test bank"
+    assert [qid for qid, _, _ in bank.questions] == ["1.1", "1.2", "2.1", "2.x", "2.3"]
+    assert bank.domains == {"1. ALPHA": ["A one?", "A two?"], "2. BETA": ["B one?", "B custom?", "B three?"]}
+
+def test_plain_dict_spec():
+    bank = compile_question_bank({"1. ALPHA": ["A one?"], "2. BETA": ["B one?", "B two?"]})
+    assert bank.key == "custom"
+    assert list(bank.index) == ["1.1", "2.1", "2.2"]
+
+def test_duplicate_ids_rejected():
+    spec = {"domains": [{"name": "1. ALPHA", "questions": ["A one?", {"id": "1.1", "text": "again"}]}]}
+    with pytest.raises(ValueError, match="Duplicate question id"):
+        compile_question_bank(spec)
+
+def test_index_and_domain_slices():
+    bank = compile_question_bank(SPEC)
+    assert bank.domain_slices == {"1. ALPHA": (0, 2), "2. BETA": (2, 5)}
+    assert bank.index == {"1.1": 0, "1.2": 1, "2.1": 2, "2.x": 3, "2.3": 4}
+    assert bank.domain_questions("2. BETA") == [("2.1", "B one?"), ("2.x", "B custom?"), ("2.3", "B three?")]
+    assert bank.domain_of("2.x") == "2. BETA"
+    assert len(bank) == 5
+
+@pytest.mark.parametrize("name", list_question_banks())
+def test_shipped_banks(name):
+    bank = load_question_bank(name)
+    assert bank.key == name
+    assert bank is load_question_bank(name)  # compiled once per process
+    for domain, (start, stop) in bank.domain_slices.items():
+        assert all(bank.questions[i][1] == domain for i in range(start, stop))
+    assert list_question_banks()[0] == DEFAULT_QUESTION_BANK
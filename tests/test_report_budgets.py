@@ -0,0 +1,56 @@
+# Size and time budgets for the PDF report, built from the golden fixtures
+# (see pspa_golden.py): the logo is embedded once per document however many
+# pages the report has, and content streams stay compressed.
+import os
+import sys
+import json
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pspa_golden import FIXTURE_DIR, build_reports, notes_scaling, xlsx_content
+import pspa_reports
+
+PDF_BYTES_BUDGET = 48 * 1024   # long_notes: 15 pages, ~32 KB
+PDF_SECONDS_BUDGET = 1.0       # long_notes: ~0.05 s
+NOTES_SCALING_SLACK = 3.0      # time per notes KB at 1 MB vs. 256 KB (measured ~0.9)
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def _build_pdf(name):
+    data = _fixture(name)
+    domain_scores, lowest_questions, questions_data, iap = pspa_reports.score_evaluation(data)
+    return pspa_reports._build_pdf_report(data["project_name"], domain_scores, lowest_questions, questions_data, iap=iap)
+
+
+def test_multipage_pdf_single_logo_within_budget():
+    _build_pdf("basic")  # warm the logo / font caches
+    t0 = time.perf_counter()
+    pdf = _build_pdf("long_notes")
+    elapsed = time.perf_counter() - t0
+    assert pdf.count(b"/Type /Page\n") > 10
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert len(pdf) <= PDF_BYTES_BUDGET, f"{len(pdf)} bytes (budget {PDF_BYTES_BUDGET})"
+    assert elapsed <= PDF_SECONDS_BUDGET, f"{elapsed:.2f} s (budget {PDF_SECONDS_BUDGET})"
+
+def test_logo_survives_temp_cleanup():
+    path = pspa_reports._pdf_logo_path()
+    if path is None:
+        return  # no logo available in this environment
+    os.remove(path)
+    pdf, _ = build_reports(_fixture("basic"))
+    assert pdf.count(b"/Subtype /Image") == 1
+
+def test_long_notes_scale_linearly():
+    small, large = notes_scaling((256, 1024))
+    assert large["s_per_kb"] <= NOTES_SCALING_SLACK * small["s_per_kb"], \
+        f"{large['s_per_kb']*1000:.3f} ms/KB at 1 MB vs {small['s_per_kb']*1000:.3f} ms/KB at 256 KB"
+    notes = [v for ref, v in xlsx_content(large["xlsx"])["cells"]["Notes"].items()
+             if ref.startswith("C") and ref != "C1"]
+    assert max(len(v) for v in notes) <= pspa_reports.EXCEL_CELL_CHARS
+    # chunks split on paragraph breaks, so only the joining newlines may go missing
+    assert sum(len(v) for v in notes) >= large["notes_chars"] * 0.99
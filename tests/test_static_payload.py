@@ -0,0 +1,58 @@
+# Bytes the dashboard sends per rerun (default view), measured headlessly with
+# AppTest by serializing every rendered element. Before the shared stylesheet
+# and templates (pspa_static) the same view sent 13582 bytes, 6498 of them
+# markdown.
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pspa_autosave
+from streamlit.testing.v1 import AppTest
+
+PAYLOAD_BUDGET = 13_000   # bytes per rerun, all elements
+MARKDOWN_BUDGET = 5_600   # bytes per rerun, markdown elements only
+
+
+@pytest.fixture
+def no_autosave(monkeypatch):
+    # The autosave caption is not part of the measured view; the flag is read
+    # at import, so patch the module too in case another test imported it
+    monkeypatch.setenv("PSPA_AUTOSAVE", "0")
+    monkeypatch.setattr(pspa_autosave, "AUTOSAVE_ENABLED", False)
+
+
+def _walk(node):
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        for child in children.values():
+            yield from _walk(child)
+
+def _rerun_payload():
+    at = AppTest.from_file(os.path.join(ROOT, "pspa_dashboard.py"), default_timeout=60)
+    at.run()
+    at.run()  # second run: what every interaction costs
+    assert not at.exception
+    total = markdown = 0
+    for node in _walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is not None and hasattr(proto, "SerializeToString"):
+            size = len(proto.SerializeToString())
+            total += size
+            if node.type == "markdown":
+                markdown += size
+    return total, markdown
+
+
+def test_rerun_payload_within_budget(no_autosave):
+    total, markdown = _rerun_payload()
+    assert total <= PAYLOAD_BUDGET, f"{total} bytes per rerun (budget {PAYLOAD_BUDGET})"
+    assert markdown <= MARKDOWN_BUDGET, f"{markdown} markdown bytes per rerun (budget {MARKDOWN_BUDGET})"
+
+def test_static_resources_shared():
+    from pspa_static import static_resources
+    assert static_resources() is static_resources()